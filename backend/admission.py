@@ -0,0 +1,69 @@
+"""Admission control: a bound on the renders waiting or running at once."""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when a render is refused because too many are already waiting."""
+
+    def __init__(self, retry_after: int) -> None:
+        """Initialize the error with the seconds after which the client may retry."""
+        super().__init__("Too many renders queued, try again later")
+        self.retry_after = retry_after
+
+
+class RequestTooLarge(ValueError):
+    """Raised when a single request asks for more steps than it may ever be given."""
+
+    def __init__(self, count: int, limit: int) -> None:
+        """Initialize the error with the number of steps requested and the limit."""
+        super().__init__(f"Request has {count} steps, at most {limit} are allowed")
+        self.limit = limit
+
+
+class Admission:
+    """
+    Counts the renders admitted and not yet finished, refusing new ones beyond
+    the capacity instead of queueing them without limit.
+    """
+
+    def __init__(self, capacity: int, retry_after: int) -> None:
+        """Initialize with no renders admitted; capacity <= 0 admits everything."""
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1) -> None:
+        """
+        Admit count renders at once, or raise RenderQueueFull and admit none.
+        A batch larger than the capacity could never be admitted, so it raises
+        RequestTooLarge instead.
+        """
+        if 0 < self.capacity < count:
+            raise RequestTooLarge(count, self.capacity)
+        with self._lock:
+            if self.capacity > 0 and self._pending + count > self.capacity:
+                raise RenderQueueFull(self.retry_after)
+            self._pending += count
+
+    def release(self, count: int = 1) -> None:
+        """Give back count admissions."""
+        with self._lock:
+            self._pending -= count
+
+    @contextmanager
+    def admit(self, count: int = 1) -> Iterator[None]:
+        """Hold count admissions for the duration of the with-block."""
+        self.acquire(count)
+        try:
+            yield
+        finally:
+            self.release(count)
+
+    def pending(self) -> int:
+        """Return the number of renders admitted and not yet finished."""
+        with self._lock:
+            return self._pending
@@ -2,37 +2,86 @@
 This module provides a Flask application for visualizing numpy operations using manim.
 """
 
-from templates.broadcast import BroadcastingAnimation
-from templates.split import SplitOperation
-from templates.transpose import MatrixTransposition
-from templates.elementwise import ElementWiseOperation
+import logging
 import os
-from manim import tempconfig
-from typing import List, Dict
-import numpy as np
-from flask import Flask, request, send_file, jsonify
+import threading
+import json
+from concurrent.futures import as_completed
+from typing import Any, Iterator, List, Dict, Optional
+from flask import Flask, Response, request, send_file, jsonify, abort, stream_with_context
 from flask_cors import CORS
-from parse import ArrayNode, OperationNode, parse
+from parse import OperationNode, parse
+from admission import RenderQueueFull, RequestTooLarge
+from cache import KEY_PATTERN
+from render import (GLYPH_WARMUP, PREVIEW_CACHE, RENDER_ADMISSION, RENDER_POOL, RENDER_WORKERS, VIDEO_CACHES, VIDEO_FORMATS,
+                    RenderLimitExceeded, cached_output, defer_steps, deferred_in_flight,
+                    generate_timeline, render_deferred, render_steps, render_template,
+                    scene_template, trace_snippet, use_pool, warm_up_glyphs)
+from jobs import DONE, JobQueue
+from metrics import CONTENT_TYPE, OPERATIONS, REGISTRY, STAGE_SECONDS, Gauge
+from sessions import SessionStore, StepRecord
 
-from templates.matmul import MatrixMultiplication
-from templates.reduction import ReductionOperation
-from templates.concat import ConcatenationOperation
-from templates.reshape import (ExpandDimsOperation, FlattenOperation,
-                               RavelOperation, ReshapeOperation, SqueezeOperation)
+UNSUPPORTED_MESSAGE = "This operation is not supported for Manim animation."
+
+# Request fields passed on to the scene templates that accept them.
+SCENE_OPTIONS = ("granularity",)
+
+# Request fields that select how the videos are encoded (see render.output_settings).
+OUTPUT_OPTIONS = ("format", "quality")
+
+# "manim" renders videos on the server; "timeline" returns JSON timelines for the
+# client to animate, which needs no rendering at all.
+RENDER_BACKEND = os.environ.get('RENDER_BACKEND', 'manim')
+BACKENDS = ("manim", "timeline")
+
+# "parse" reads the operations from the code's syntax; "trace" runs the code once in a
+# restricted namespace, in a worker with CPU and memory limits, and records the NumPy
+# calls it makes, so loops and helpers work.
+PARSE_FRONTEND = os.environ.get('PARSE_FRONTEND', 'parse')
+FRONTENDS = {"parse": parse, "trace": trace_snippet}
+
+# Default seconds of video a whole request may render, shared evenly by its steps.
+RENDER_BUDGET = os.environ.get('RENDER_BUDGET')
+
+# Operations a single request may contain, counting every snippet of a batch.
+MAX_REQUEST_STEPS = int(os.environ.get('MAX_REQUEST_STEPS', 100))
+
+# Render each step when its video is first requested rather than before responding
+# (set to 0 to render every step up front).
+LAZY_RENDER = int(os.environ.get('LAZY_RENDER', 1))
+
+# Video URLs are content-addressed, so clients and proxies may cache them indefinitely.
+VIDEO_MAX_AGE = int(os.environ.get('VIDEO_MAX_AGE', 365 * 24 * 60 * 60))
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, resources={
-     r"/visualize": {"origins": ["http://127.0.0.1:3000", "https://numpyviz.vercel.app/"]}})
+     r"/visualize": {"origins": ["http://127.0.0.1:3000", "https://numpyviz.vercel.app/"]},
+     r"/visualize/stream": {"origins": ["http://127.0.0.1:3000",
+                                        "https://numpyviz.vercel.app/"]},
+     r"/visualize/batch": {"origins": ["http://127.0.0.1:3000",
+                                       "https://numpyviz.vercel.app/"]},
+     r"/jobs/*": {"origins": ["http://127.0.0.1:3000", "https://numpyviz.vercel.app/"]}})
 
-ELEMENTWISE_OPS = ["add", "subtract", "multiply", "divide", "floor_divide", "mod", "power",
-                   "sin", "cos", "tan", "arcsin", "arccos", "arctan", "sinh", "cosh", "tanh",
-                   "arcsinh", "arccosh", "arctanh", "exp", "expm1", "exp2", "log", "log10",
-                   "log2", "log1p", "round", "floor", "ceil", "trunc", "sqrt", "cbrt",
-                   "square", "abs", "fabs", "sign", "heaviside", "maximum", "minimum"]
+RENDER_JOBS = JobQueue()
+SESSIONS = SessionStore()
 
-MEDIA_DIR = os.path.join(os.getcwd(), 'media')
-VIDEO_DIR = os.path.join(MEDIA_DIR, 'videos')
-os.makedirs(VIDEO_DIR, exist_ok=True)
+REGISTRY.register(Gauge("numpyviz_render_queue_depth",
+                        "Background render jobs queued or rendering.", RENDER_JOBS.depth))
+REGISTRY.register(Gauge("numpyviz_deferred_renders_in_flight",
+                        "Deferred videos being rendered on request.", deferred_in_flight))
+REGISTRY.register(Gauge("numpyviz_renders_admitted",
+                        "Renders admitted and not yet finished.", RENDER_ADMISSION.pending))
+
+# Warm up before the first request: render workers are started now and typeset the
+# common glyphs as they start (see render.init_worker), or the web process does it.
+if GLYPH_WARMUP and use_pool(RENDER_WORKERS):
+    RENDER_POOL.start()
+elif GLYPH_WARMUP:
+    threading.Thread(target=warm_up_glyphs, name="glyph-warmup", daemon=True).start()
 
 
 @app.route('/')
@@ -45,127 +94,539 @@ def index() -> str:
 def visualize() -> str:
     """
     Main handler for generating visualization.
-    Returns a JSON response with the results of the visualization.
+    Returns a JSON response with the results of the visualization; the request
+    options are listed in the README.
     """
-    numpy_code = request.json['code']
+    render_async = bool(request.json.get('async', False))
+    backend = request.json.get('backend', RENDER_BACKEND)
+    session_id = request.json.get('session_id')
+    options = request_options(request.json)
 
     try:
-        # Sanity check: run python code
-        # safe_globals = {"np": np}
-        # exec(numpy_code, safe_globals)
-        # print("after exec")
-
-        op_nodes = parse(numpy_code)
-        print("after parse")
-        results = process_operations(op_nodes)
-        print("after operations")
+        op_nodes = parse_request(request.json, options)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
+        if backend == "timeline":
+            results = timeline_operations(op_nodes, options)
+        elif render_async:
+            results = submit_operations(op_nodes, session_id, options)
+        else:
+            results = process_operations(op_nodes, session_id, options)
         return jsonify(results)
+    except (RenderQueueFull, RequestTooLarge):
+        raise
     except Exception as e:
         # If parsing or processing fails, return an error response
         return jsonify({"error": str(e)}), 400
 
 
-def process_operations(operation_nodes: List[OperationNode]) -> List[Dict[str, str]]:
+def request_options(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the scene and output options of a /visualize request body."""
+    options = {name: body[name] for name in SCENE_OPTIONS + OUTPUT_OPTIONS if name in body}
+    if body.get('preview'):
+        options["preview"] = True
+    return options
+
+
+def parse_request(body: Dict[str, Any], options: Dict[str, Any]) -> List[OperationNode]:
+    """
+    Reads the operations from a request's code with the requested front end, and
+    adds the request's render budget to the options (see step_options).
+    """
+    frontend = body.get('frontend', PARSE_FRONTEND)
+    if frontend not in FRONTENDS:
+        raise ValueError(f"Unsupported frontend: {frontend}")
+    with STAGE_SECONDS.time(stage="parse"):
+        op_nodes = FRONTENDS[frontend](body['code'])
+    if len(op_nodes) > MAX_REQUEST_STEPS:
+        raise RequestTooLarge(len(op_nodes), MAX_REQUEST_STEPS)
+    budget = body.get('budget', RENDER_BUDGET)
+    if budget is not None:
+        if float(budget) <= 0:
+            raise ValueError("Render budget must be positive")
+        options["budget"] = float(budget)
+    return op_nodes
+
+
+def step_options(operation_nodes: List[OperationNode],
+                 options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the options the steps are rendered with: the request's budget is
+    replaced by each step's share of it. Sessions are keyed by the request's
+    options instead, so that adding a step, which changes the share, does not
+    re-render the unchanged ones.
+    """
+    if not options or options.get("budget") is None:
+        return options
+    return {**options, "budget": step_budget(operation_nodes, options["budget"])}
+
+
+def step_budget(operation_nodes: List[OperationNode], budget: float) -> float:
+    """Returns the share of the request's render budget given to each animated step."""
+    if budget <= 0:
+        raise ValueError("Render budget must be positive")
+    animated = [node for node in operation_nodes if scene_template(node) is not None]
+    return budget / max(1, len(animated))
+
+
+def describe_operation(node: OperationNode, changed: bool = True) -> Dict[str, str]:
+    """Returns the JSON description of a computed operation node."""
+    return {
+        "operation": node.operation,
+        "input": f"Operands: {node.operands}, Keyword Args: {node.kwargs}",
+        "output": str(node.result),
+        "changed": changed,
+    }
+
+
+def output_urls(video_id: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Returns the URL of a step's rendered output: its preview image or its video."""
+    if (options or {}).get("preview"):
+        return {"preview_url": f"/preview/{video_id}"}
+    return {"video_url": f"/video/{video_id}"}
+
+
+def compute_operations(operation_nodes: List[OperationNode],
+                       previous: Dict[str, StepRecord]) -> List[OperationNode]:
+    """
+    Computes the operations in order, restoring the result of every node that is
+    unchanged since the previous evaluation instead of recomputing it.
+    Returns the nodes that had to be computed.
+    """
+    changed = []
+    for node in operation_nodes:
+        if node.key in previous:
+            previous[node.key].restore(node)
+        else:
+            with STAGE_SECONDS.time(stage="compute"):
+                node.compute()
+            OPERATIONS.inc(operation=node.operation)
+            changed.append(node)
+    return changed
+
+
+def process_operations(operation_nodes: List[OperationNode],
+                       session_id: Optional[str] = None,
+                       options: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
     """
     Processes the operations and generates the manim animations.
+    All operations are computed first. With LAZY_RENDER the steps are only
+    registered, and each is rendered when its URL is first requested; otherwise
+    they are rendered now (in parallel when RENDER_WORKERS > 1), and a step whose
+    render fails reports its error without failing the others. Steps unchanged
+    since the session's previous request keep their results and videos.
     Returns a list of dictionaries with the results of the operations.
     """
+    previous = SESSIONS.previous(session_id, options)
+    render_options = step_options(operation_nodes, options)
+    changed = {node.key for node in compute_operations(operation_nodes, previous)}
+    # Unchanged steps whose render failed before are rendered again
+    pending = [node for node in operation_nodes
+               if node.key in changed
+               or (not previous[node.key].video_id and scene_template(node) is not None)]
+    failures: Dict[int, str] = {}
+    if LAZY_RENDER:
+        keys = defer_steps(pending, render_options)
+    else:
+        keys = render_steps(pending, render_options, errors=failures)
+    rendered = dict(zip((node.key for node in pending), keys))
+    errors = {pending[i].key: error for i, error in failures.items()}
+    video_ids = [rendered[node.key] if node.key in rendered else previous[node.key].video_id
+                 for node in operation_nodes]
+    SESSIONS.remember(session_id, operation_nodes, video_ids, options)
+
+    results = []
+    for node, video_id in zip(operation_nodes, video_ids):
+        result = describe_operation(node, node.key in changed)
+        if video_id:
+            result.update(output_urls(video_id, options))
+        elif node.key in errors:
+            result["error"] = errors[node.key]
+        else:
+            result["message"] = UNSUPPORTED_MESSAGE
+        results.append(result)
+    return results
+
+
+def timeline_operations(operation_nodes: List[OperationNode],
+                        options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Computes the operations and describes each step's animation as a JSON timeline.
+    Returns a list of dictionaries with the results and the timeline of each step.
+    """
+    compute_operations(operation_nodes, {})
+    render_options = step_options(operation_nodes, options)
+    results = []
+    for node in operation_nodes:
+        result = describe_operation(node)
+        timeline = generate_timeline(node, render_options)
+        if timeline is not None:
+            result["timeline"] = timeline
+        else:
+            result["message"] = UNSUPPORTED_MESSAGE
+        results.append(result)
+    return results
+
+
+def submit_operations(operation_nodes: List[OperationNode],
+                      session_id: Optional[str] = None,
+                      options: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+    """
+    Computes the operations and queues their animations as background render jobs.
+    Steps unchanged since the session's previous request reuse their finished videos;
+    the videos of queued steps are added to the session as their jobs finish.
+    Returns a list of dictionaries with the results and the job of each step.
+    """
+    previous = SESSIONS.previous(session_id, options)
+    changed = compute_operations(operation_nodes, previous)
+
+    def needs_job(node: OperationNode) -> bool:
+        record = previous.get(node.key)
+        return scene_template(node) is not None and (record is None or not record.video_id)
+
+    steps = [(node, i) for i, node in enumerate(operation_nodes) if needs_job(node)]
+    jobs = dict(zip((i for _, i in steps),
+                    RENDER_JOBS.submit_all(steps, step_options(operation_nodes, options))))
+
     results = []
+    video_ids: List[Optional[str]] = []
     for i, node in enumerate(operation_nodes):
-        node.compute()
-        animation_generated = generate_manim_animation(node, i)
-        result = {
-            "operation": node.operation,
-            "input": f"Operands: {node.operands}, Keyword Args: {node.kwargs}",
-            "output": str(node.result),
-        }
-        if animation_generated:
-            result["video_url"] = f"/video/{i}"
+        record = previous.get(node.key)
+        result = describe_operation(node, node in changed)
+        if scene_template(node) is None:
+            result["message"] = UNSUPPORTED_MESSAGE
+        elif i not in jobs:
+            result.update(output_urls(record.video_id, options))
         else:
-            result["message"] = "This operation is not supported for Manim animation."
+            job = jobs[i]
+            result["job_id"] = job.job_id
+            result["status"] = job.status
+            result["status_url"] = f"/jobs/{job.job_id}"
+        video_ids.append(record.video_id if record is not None else None)
         results.append(result)
+    SESSIONS.remember(session_id, operation_nodes, video_ids, options)
+    for i, job in jobs.items():
+        job.future.add_done_callback(
+            lambda _, job=job, node=operation_nodes[i]: SESSIONS.record_video(
+                session_id, node.key, job.video_id, options))
     return results
 
 
-def generate_manim_animation(node: OperationNode, index: int) -> bool:
-    """
-    Generates a manim animation for the given operation node.
-    The animation is saved to a file with the given index.
-    """
-    operation = node.operation
-    op_args = node.operands
-    kwargs = node.kwargs
-    output_file = f'Visualization_{index}'
-
-    for operand in op_args:
-        if not isinstance(operand, (np.ndarray, list, tuple, int, float)):
-            raise ValueError(f"Invalid operand type: {type(operand)}")
-
-    custom_config = {
-        "output_file": output_file,
-        "format": "mp4",
-        "media_dir": MEDIA_DIR,
-        "video_dir": VIDEO_DIR,
-        "images_dir": os.path.join(MEDIA_DIR, "images"),
-        "tex_dir": os.path.join(MEDIA_DIR, "Tex"),
-        "text_dir": os.path.join(MEDIA_DIR, "texts"),
-        "partial_movie_dir": os.path.join(MEDIA_DIR, "partial_movie_files"),
-        "quality": "low_quality",
-        "frame_rate": 5,
-        "pixel_width": 854,
-        "pixel_height": 480
-    }
+def stream_operations(operation_nodes: List[OperationNode],
+                      session_id: Optional[str] = None,
+                      options: Optional[Dict[str, Any]] = None,
+                      admitted: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Computes the operations one by one and yields a "step" event with each result
+    as soon as it is computed, then a "video" event (or an "error" event) for each
+    render as soon as it finishes, in completion order, and finally a "done" event.
+    With LAZY_RENDER the step events already carry their URLs, as nothing renders
+    before the URLs are requested.
+    admitted is the number of admissions held for the renders (see stream_admissions);
+    the renders take them over and the rest are given back.
+    """
+    previous = SESSIONS.previous(session_id, options)
+    render_options = step_options(operation_nodes, options)
+    video_ids: List[Optional[str]] = []
+    pending = []
+    try:
+        for i, node in enumerate(operation_nodes):
+            changed = compute_operations([node], previous)
+            record = previous.get(node.key)
+            if scene_template(node) is None:
+                video_id = None
+            elif record is not None and record.video_id:
+                video_id = record.video_id
+            elif LAZY_RENDER:
+                video_id = defer_steps([node], render_options)[0]
+            else:
+                video_id = None
+                pending.append((node, i))
+            video_ids.append(video_id)
 
-    with tempconfig(custom_config):
-        if operation in ELEMENTWISE_OPS:
-            scene = ElementWiseOperation(
-                *op_args, operation=operation, result=node.result, ** kwargs)
-        elif operation in ["matmul", "dot"]:
-            scene = MatrixMultiplication(
-                *op_args, **kwargs)
-        elif operation in ["sum", "mean", "max", "min", "median", "std", "var", "prod", "average"]:
-            scene = ReductionOperation(
-                *op_args, operation=operation, result=node.result, ** kwargs)
-        elif operation == "reshape":
-            scene = ReshapeOperation(*op_args, result=node.result, ** kwargs)
-        elif operation == "ravel":
-            scene = RavelOperation(*op_args, result=node.result, **kwargs)
-        elif operation == "flatten":
-            scene = FlattenOperation(*op_args, result=node.result, **kwargs)
-        elif operation == "squeeze":
-            scene = SqueezeOperation(*op_args, result=node.result, **kwargs)
-        elif operation == "expand_dims":
-            scene = ExpandDimsOperation(*op_args, result=node.result, **kwargs)
-        elif operation == "concatenate":
-            scene = ConcatenationOperation(
-                *op_args, result=node.result, **kwargs)
-        elif operation == "split":
-            scene = SplitOperation(*op_args, result=node.result, **kwargs)
-        elif operation == "transpose":
-            scene = MatrixTransposition(*op_args, **kwargs)
-        elif operation == "broadcast_to":
-            scene = BroadcastingAnimation(
-                *op_args, result=node.result, **kwargs)
+            event = {"type": "step", "step": i, **describe_operation(node, bool(changed))}
+            if video_id:
+                event.update(output_urls(video_id, options))
+            elif scene_template(node) is None:
+                event["message"] = UNSUPPORTED_MESSAGE
+            yield event
+    except BaseException:
+        # Also when the client went away before every step was sent
+        RENDER_ADMISSION.release(admitted)
+        raise
+
+    RENDER_ADMISSION.release(admitted - len(pending))
+    jobs = (RENDER_JOBS.submit_all(pending, render_options, admitted=admitted > 0)
+            if pending else [])
+    by_future = {job.future: job for job in jobs}
+    for future in as_completed(by_future):
+        job = by_future[future]
+        if job.status == DONE and job.video_id:
+            video_ids[job.index] = job.video_id
+            yield {"type": "video", "step": job.index, **output_urls(job.video_id, options)}
         else:
-            return False
-        print("render")
+            yield {"type": "error", "step": job.index, "error": job.error}
+    SESSIONS.remember(session_id, operation_nodes, video_ids, options)
+    yield {"type": "done"}
+
+
+def stream_admissions(operation_nodes: List[OperationNode]) -> int:
+    """
+    Admits the renders a stream may start before the response starts, so that a
+    full queue is refused with 503 rather than an "error" event; returns the number
+    of admissions held, one per animated step, or none with LAZY_RENDER.
+    """
+    if LAZY_RENDER:
+        return 0
+    count = sum(1 for node in operation_nodes if scene_template(node) is not None)
+    RENDER_ADMISSION.acquire(count)
+    return count
 
-        scene.render()
-    return True
 
+def format_event(event: Dict[str, Any], sse: bool) -> str:
+    """Formats an event as a server-sent event or as a line of newline-delimited JSON."""
+    data = json.dumps(event, default=str)
+    if sse:
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
 
-@app.route('/video/<int:index>')
-def serve_video(index: int):
-    video_path = os.path.join(VIDEO_DIR, f'Visualization_{index}.mp4')
-    if not os.path.exists(video_path):
-        print(f"Video file not found: {video_path}")
-        abort(404, description="Video file not found")
 
+@app.route('/visualize/stream', methods=['POST'])
+def visualize_stream() -> Response:
+    """
+    Streaming variant of /visualize for the manim backend: each step is sent as
+    soon as it is computed and its video URL as soon as its render finishes (see
+    stream_operations), so the first result does not wait for the last video.
+    The response is newline-delimited JSON, or server-sent events if the client
+    accepts text/event-stream. A full render queue is refused before the response
+    starts; errors after it started are sent as an "error" event without a step.
+    """
+    session_id = request.json.get('session_id')
+    options = request_options(request.json)
     try:
-        return send_file(video_path, mimetype='video/mp4', as_attachment=False)
+        op_nodes = parse_request(request.json, options)
+    except RequestTooLarge:
+        raise
     except Exception as e:
-        print(f"Error serving video: {str(e)}")
-        abort(500, description="Error serving video")
+        return jsonify({"error": str(e)}), 400
+    admitted = stream_admissions(op_nodes)
+
+    sse = request.accept_mimetypes.best_match(
+        ["application/x-ndjson", "text/event-stream"]) == "text/event-stream"
+
+    def generate() -> Iterator[str]:
+        try:
+            for event in stream_operations(op_nodes, session_id, options, admitted):
+                yield format_event(event, sse)
+        except Exception as e:
+            logger.exception("Streaming visualization failed")
+            yield format_event({"type": "error", "error": str(e)}, sse)
+
+    response = Response(stream_with_context(generate()),
+                        mimetype="text/event-stream" if sse else "application/x-ndjson")
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep reverse proxies such as nginx from buffering the stream.
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def visualize_batch(snippets: List[str], options: Optional[Dict[str, Any]] = None,
+                    frontend: str = PARSE_FRONTEND) -> Dict[str, Any]:
+    """
+    Visualizes many snippets at once, e.g. to pre-generate a course's worth of steps.
+    The snippets' operation DAGs are merged: an operation that several snippets
+    share is computed once, and every distinct scene is rendered once, in
+    parallel in the render workers (or registered for rendering on first request
+    with LAZY_RENDER), so identical steps of different snippets share one video.
+    Returns the results of every snippet in order, each either its steps (as in
+    /visualize, with a per-step "error" if its render failed) or an "error",
+    together with the numbers of distinct operations and scenes.
+    """
+    options = dict(options or {})
+    if frontend not in FRONTENDS:
+        raise ValueError(f"Unsupported frontend: {frontend}")
+    if len(snippets) > MAX_REQUEST_STEPS:
+        raise RequestTooLarge(len(snippets), MAX_REQUEST_STEPS)
+
+    operations = 0
+    computed: Dict[str, StepRecord] = {}
+    # One node per distinct scene, in order of first appearance
+    scenes: Dict[str, OperationNode] = {}
+    render_keys: Dict[int, Optional[str]] = {}
+    parsed: List[Any] = []
+    for code in snippets:
+        try:
+            with STAGE_SECONDS.time(stage="parse"):
+                op_nodes = FRONTENDS[frontend](code)
+        except Exception as e:
+            parsed.append(e)
+            continue
+        operations += len(op_nodes)
+        if operations > MAX_REQUEST_STEPS:
+            raise RequestTooLarge(operations, MAX_REQUEST_STEPS)
+        try:
+            for node in compute_operations(op_nodes, computed):
+                computed[node.key] = StepRecord(node, None)
+            templates = [render_template(node, options) for node in op_nodes]
+        except Exception as e:
+            parsed.append(e)
+            continue
+        for node, template in zip(op_nodes, templates):
+            render_keys[id(node)] = template[0] if template is not None else None
+            if template is not None:
+                scenes.setdefault(template[0], node)
+        parsed.append(op_nodes)
+
+    errors: Dict[str, str] = {}
+    if LAZY_RENDER:
+        defer_steps(list(scenes.values()), options)
+    else:
+        steps = [(node, i) for i, node in enumerate(scenes.values())]
+        jobs = RENDER_JOBS.submit_all(steps, options)
+        keys = list(scenes)
+        for job in jobs:
+            job.future.result()
+            if job.status != DONE:
+                errors[keys[job.index]] = job.error
+
+    results = []
+    for op_nodes in parsed:
+        if isinstance(op_nodes, Exception):
+            results.append({"error": str(op_nodes)})
+            continue
+        steps = []
+        for node in op_nodes:
+            step = describe_operation(node)
+            key = render_keys[id(node)]
+            if key is None:
+                step["message"] = UNSUPPORTED_MESSAGE
+            elif key in errors:
+                step["error"] = errors[key]
+            else:
+                step.update(output_urls(key, options))
+            steps.append(step)
+        results.append({"steps": steps})
+    return {"results": results, "operations": len(computed), "scenes": len(scenes)}
+
+
+@app.route('/visualize/batch', methods=['POST'])
+def visualize_batch_request():
+    """
+    Batch variant of /visualize: takes a list of "snippets" (with the same options
+    as /visualize, applied to all of them) and returns their results in order,
+    rendering each distinct step only once (see visualize_batch).
+    """
+    try:
+        snippets = request.json['snippets']
+        if not isinstance(snippets, list):
+            raise ValueError("snippets must be a list of code strings")
+        options = request_options(request.json)
+        frontend = request.json.get('frontend', PARSE_FRONTEND)
+        return jsonify(visualize_batch(snippets, options, frontend))
+    except (RenderQueueFull, RequestTooLarge):
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id: str):
+    """Returns the render status of a job, with its video URL once it is done."""
+    job = RENDER_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+
+def render_output(key: str, preview: bool = False) -> Optional[str]:
+    """Renders a deferred step's output on its first request; returns its path if known."""
+    try:
+        return render_deferred(key, preview)
+    except RenderQueueFull:
+        raise
+    except RenderLimitExceeded as e:
+        logger.warning("Render of %s stopped: %s", key, e)
+        abort(500, description=str(e))
+    except Exception:
+        logger.exception("Error rendering %s", key)
+        abort(500, description="Error rendering visualization")
+
+
+def missing_output(key: str, kind: str) -> None:
+    """
+    Aborts a request for an output that is neither cached nor pending. A well-formed
+    key was handed out by /visualize and has since been evicted (see
+    PENDING_MAX_BYTES), so the client gets 410 and is told to submit the code again.
+    """
+    if KEY_PATTERN.fullmatch(key):
+        abort(410, description=f"{kind} has expired, submit the code to /visualize again")
+    abort(404, description=f"{kind} file not found")
+
+
+@app.route('/video/<video_id>')
+def serve_video(video_id: str):
+    """
+    Serves a rendered video from the render cache by its content hash, rendering
+    it first if the step was deferred and this is the first request for it.
+    Supports byte ranges (206), strong ETags and conditional requests (304).
+    """
+    with STAGE_SECONDS.time(stage="serve_video"):
+        video_path = cached_output(video_id, count=LAZY_RENDER) or render_output(video_id)
+        if video_path is None:
+            logger.info("Video file not found: %s", video_id)
+            missing_output(video_id, "Video")
+
+        fmt = video_path.rsplit(".", 1)[-1]
+        try:
+            response = send_file(video_path, mimetype=VIDEO_FORMATS[fmt], as_attachment=False,
+                                 conditional=True,
+                                 etag=VIDEO_CACHES[fmt].content_digest(video_id),
+                                 max_age=VIDEO_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+        except Exception:
+            logger.exception("Error serving video %s", video_id)
+            abort(500, description="Error serving video")
+
+
+@app.route('/preview/<preview_id>')
+def serve_preview(preview_id: str):
+    """Serves the still preview of a step from the preview cache by its content hash."""
+    with STAGE_SECONDS.time(stage="serve_preview"):
+        preview_path = (cached_output(preview_id, preview=True, count=LAZY_RENDER)
+                        or render_output(preview_id, preview=True))
+        if preview_path is None:
+            logger.info("Preview file not found: %s", preview_id)
+            missing_output(preview_id, "Preview")
+
+        response = send_file(preview_path, mimetype='image/png', conditional=True,
+                             etag=PREVIEW_CACHE.content_digest(preview_id),
+                             max_age=VIDEO_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+@app.errorhandler(RenderQueueFull)
+def render_queue_full(error: RenderQueueFull):
+    """Refuses work while the render queue is full, telling the client when to retry."""
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+@app.errorhandler(RequestTooLarge)
+def request_too_large(error: RequestTooLarge):
+    """Refuses requests with more steps than may be rendered for one request."""
+    return jsonify({"error": str(error)}), 413
+
+
+@app.route('/metrics')
+def metrics() -> Response:
+    """Serves the process's metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 
 if __name__ == '__main__':
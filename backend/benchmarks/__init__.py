@@ -0,0 +1 @@
+"""Reproducible benchmarks for parsing, computing and rendering operation steps."""
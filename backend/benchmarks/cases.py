@@ -0,0 +1,61 @@
+"""
+Benchmark cases: one snippet of numpy code per operation and array size.
+
+Every case ends with the operation being measured, and together the cases
+cover every scene class in templates/.
+"""
+
+from typing import Dict, List
+
+# Side lengths of the square arrays each operation is run on; they must be even.
+SIZES = [2, 4, 8, 16]
+
+# The statement measured for each operation, over square arrays a and b of side
+# n, a row r of shape (1, n) and a vector v of length n.
+OPERATIONS: Dict[str, str] = {
+    "add": "np.add(a, b)",
+    "sqrt": "np.sqrt(a)",
+    "matmul": "np.matmul(a, b)",
+    "sum": "np.sum(a)",
+    "sum_axis0": "np.sum(a, axis=0)",
+    "transpose": "np.transpose(a)",
+    "reshape": "np.reshape(a, ({half}, {double}))",
+    "ravel": "np.ravel(a)",
+    "flatten": "np.flatten(a)",
+    "squeeze": "np.squeeze(r)",
+    "expand_dims": "np.expand_dims(a, 0)",
+    "concatenate": "np.concatenate([a, b], axis=0)",
+    "split": "np.split(a, 2, axis=1)",
+    "broadcast_to": "np.broadcast_to(v, ({n}, {n}))",
+}
+
+
+class BenchmarkCase:
+    """Class representing one operation benchmarked at one array size."""
+
+    def __init__(self, operation: str, size: int) -> None:
+        """Initialize the case for an operation from OPERATIONS over arrays of side size."""
+        self.operation = operation
+        self.size = size
+        self.name = f"{operation}-{size}"
+
+    def code(self) -> str:
+        """Return the numpy code of the case; the measured operation comes last."""
+        n = self.size
+        a = [[(i * n + j) % 10 for j in range(n)] for i in range(n)]
+        b = [[(i + 2 * j) % 10 for j in range(n)] for i in range(n)]
+        statement = OPERATIONS[self.operation].format(n=n, half=n // 2, double=2 * n)
+        return "\n".join([
+            f"a = np.array({a})",
+            f"b = np.array({b})",
+            f"r = np.array([{list(range(n))}])",
+            f"v = np.array({list(range(n))})",
+            f"result = {statement}",
+        ])
+
+
+def all_cases(operations: List[str] = None, sizes: List[int] = None) -> List[BenchmarkCase]:
+    """Return the cases for the given operations and sizes (all of them by default)."""
+    return [BenchmarkCase(operation, size)
+            for operation in (operations or list(OPERATIONS))
+            for size in (sizes or SIZES)]
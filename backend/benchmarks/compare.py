@@ -0,0 +1,94 @@
+"""
+Compare benchmark results against a stored baseline.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.compare baseline.json results.json [--threshold 0.2]
+
+A metric regresses when it grew by more than the threshold (relative) and by
+more than a small absolute margin, so that millisecond-level noise in fast
+stages is not reported. Exits with status 1 if any metric regressed.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# Growth below these absolute amounts is never a regression.
+MIN_SECONDS = 0.005
+MIN_RSS_MB = 5.0
+MIN_BYTES = 1024
+
+
+def metrics(result: Dict[str, Any]) -> Dict[str, Tuple[float, float]]:
+    """Return each comparable metric of a result with its absolute noise margin."""
+    values = {f"stages.{stage}": (seconds, MIN_SECONDS)
+              for stage, seconds in result["stages"].items()}
+    values["total"] = (result["total"], MIN_SECONDS)
+    values["peak_rss_mb"] = (result["peak_rss_mb"], MIN_RSS_MB)
+    values["video_bytes"] = (result["video_bytes"], MIN_BYTES)
+    return values
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float) -> List[Dict[str, Any]]:
+    """Return one row per metric of every case present in both runs."""
+    base_results = {result["case"]: result for result in baseline["results"]
+                    if "error" not in result}
+    rows = []
+    for result in current["results"]:
+        base = base_results.get(result["case"])
+        if base is None or "error" in result:
+            continue
+        base_metrics = metrics(base)
+        for name, (value, margin) in metrics(result).items():
+            if name not in base_metrics:
+                continue
+            before = base_metrics[name][0]
+            ratio = value / before if before else float("inf") if value else 1.0
+            rows.append({
+                "case": result["case"],
+                "metric": name,
+                "baseline": before,
+                "current": value,
+                "ratio": ratio,
+                "regressed": ratio > 1 + threshold and value - before > margin,
+            })
+    return rows
+
+
+def compare_files(baseline_path: str, current_path: str, threshold: float) -> int:
+    """Print the comparison of two results files; returns 1 on any regression."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, threshold)
+    regressions = [row for row in rows if row["regressed"]]
+    for row in regressions:
+        print(f"REGRESSION {row['case']:24} {row['metric']:18} "
+              f"{row['baseline']:12.4f} -> {row['current']:12.4f} ({row['ratio']:.2f}x)")
+
+    missing = ({result["case"] for result in baseline["results"]}
+               - {result["case"] for result in current["results"] if "error" not in result})
+    for case in sorted(missing):
+        print(f"MISSING    {case}")
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressed "
+          f"(threshold {threshold:.0%})")
+    return 1 if regressions or missing else 0
+
+
+def main(argv: List[str] = None) -> int:
+    """Compare two results files from the command line; returns the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return compare_files(args.baseline, args.current, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Run the benchmark suite and write the results as JSON.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.run --output results.json [--repeat 3] [--sizes 2 4]
+                             [--operations add matmul] [--baseline baseline.json]
+
+Each case runs in a fresh worker process, so its peak memory is its own. The
+stages recorded per case, as the median over the repeats, are:
+
+    parse      parse_numpy_code on the case's code
+    compute    OperationNode.compute for every node
+    construct  building the scene and its last frame, with animations skipped
+    frames     rendering the animation frames (full render minus the other two)
+    encode     writing frames to ffmpeg and combining the partial movies
+
+Render caches are bypassed, so every repeat renders from scratch; only the
+LaTeX cache is kept across cases, as in a long-running server.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.cases import BenchmarkCase, all_cases
+from metrics import StageTimer
+
+STAGES = ("parse", "compute", "construct", "frames", "encode")
+
+
+def render_once(node: Any, config: Dict[str, Any], work_dir: str) -> float:
+    """Render a computed node with the given manim config; returns the seconds taken."""
+    from manim import tempconfig
+    from render import scene_template
+
+    scene_class, template_kwargs = scene_template(node)
+    with tempconfig({**config, "media_dir": work_dir,
+                     "video_dir": os.path.join(work_dir, "videos"),
+                     "images_dir": os.path.join(work_dir, "images"),
+                     "partial_movie_dir": os.path.join(work_dir, "partial_movie_files")}):
+        start = time.perf_counter()
+        scene = scene_class(*node.operands, **template_kwargs, **node.kwargs)
+        scene.render()
+        return time.perf_counter() - start
+
+
+def run_case(case: BenchmarkCase, repeat: int, tex_dir: str) -> Dict[str, Any]:
+    """Measure one case in the current process; returns its result record."""
+    from manim.scene.scene_file_writer import SceneFileWriter
+    from parse import parse_numpy_code
+    from render import ENCODE_METHODS, PREVIEW_CONFIG, RENDER_QUALITY
+
+    encode = StageTimer()
+    for name in ENCODE_METHODS:
+        if hasattr(SceneFileWriter, name):
+            setattr(SceneFileWriter, name, encode.wrap(getattr(SceneFileWriter, name)))
+
+    config = {**RENDER_QUALITY, "tex_dir": tex_dir, "disable_caching": True,
+              "output_file": "benchmark", "verbosity": "ERROR", "progress_bar": "none"}
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    video_bytes = 0
+
+    for _ in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix="bench-")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                nodes = parse_numpy_code(case.code())
+                samples["parse"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                for node in nodes:
+                    node.compute()
+                samples["compute"].append(time.perf_counter() - start)
+
+                node = nodes[-1]
+                construct = render_once(node, {**config, **PREVIEW_CONFIG},
+                                        os.path.join(work_dir, "preview"))
+                encode.elapsed = 0.0
+                total = render_once(node, config, os.path.join(work_dir, "video"))
+
+            samples["construct"].append(construct)
+            samples["encode"].append(encode.elapsed)
+            samples["frames"].append(max(0.0, total - construct - encode.elapsed))
+            video = os.path.join(work_dir, "video", "videos",
+                                 f"benchmark.{RENDER_QUALITY['format']}")
+            video_bytes = os.path.getsize(video)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    stages = {stage: statistics.median(values) for stage, values in samples.items()}
+    return {
+        "case": case.name,
+        "operation": case.operation,
+        "size": case.size,
+        "stages": stages,
+        "total": sum(stages.values()),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "baseline_rss_mb": baseline_rss,
+        "video_bytes": video_bytes,
+    }
+
+
+def run_isolated(case: BenchmarkCase, repeat: int, tex_dir: str) -> Dict[str, Any]:
+    """Measure one case in a fresh process; failures are recorded, not raised."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        try:
+            return pool.apply(run_case, (case, repeat, tex_dir))
+        except Exception as e:
+            return {"case": case.name, "operation": case.operation, "size": case.size,
+                    "error": str(e)}
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and library versions the results were measured with."""
+    import numpy
+    try:
+        from importlib.metadata import version
+        manim_version = version("manim")
+    except Exception:
+        manim_version = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "manim": manim_version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the suite from the command line; returns the process exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", type=int, nargs="*")
+    parser.add_argument("--operations", nargs="*")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative slowdown before a regression is reported")
+    args = parser.parse_args(argv)
+
+    tex_dir = tempfile.mkdtemp(prefix="bench-tex-")
+    results = []
+    try:
+        for case in all_cases(args.operations, args.sizes):
+            result = run_isolated(case, args.repeat, tex_dir)
+            results.append(result)
+            if "error" in result:
+                print(f"{case.name:24} failed: {result['error']}")
+            else:
+                print(f"{case.name:24} {result['total']:8.3f}s "
+                      f"{result['peak_rss_mb']:8.1f} MiB {result['video_bytes']:>10} B")
+    finally:
+        shutil.rmtree(tex_dir, ignore_errors=True)
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        from benchmarks.compare import compare_files
+        return compare_files(args.baseline, args.output, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
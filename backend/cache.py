@@ -0,0 +1,126 @@
+"""Persistent content-addressed cache for rendered visualizations."""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Dict, Optional, Tuple
+
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class RenderCache:
+    """
+    A directory of rendered files named by content hash, bounded by a disk quota.
+
+    Entries are evicted least-recently-used first, using the file modification time
+    (refreshed on every hit) as the recency marker.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, extension: str = "mp4",
+                 key_pattern: re.Pattern = KEY_PATTERN) -> None:
+        """Initialize the cache, creating its directory if needed."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.key_pattern = key_pattern
+        self._lock = threading.Lock()
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        """Return the path where the entry for the given key is stored."""
+        if not self.key_pattern.fullmatch(key):
+            raise ValueError(f"Invalid cache key: {key}")
+        return os.path.join(self.directory, f"{key}.{self.extension}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the path of the cached file for the key, or None on a miss."""
+        if not self.key_pattern.fullmatch(key):
+            return None
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def content_digest(self, key: str) -> str:
+        """
+        Return the SHA-256 of the cached file's bytes, for use as a strong ETag.
+
+        The digest is remembered per file (inode and size), so it is only computed once.
+        """
+        path = self.path_for(key)
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(key)
+        if known and known[:2] == (stat.st_ino, stat.st_size):
+            return known[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._digests[key] = (stat.st_ino, stat.st_size, digest.hexdigest())
+        return digest.hexdigest()
+
+    def put(self, key: str, source: str) -> str:
+        """Move a freshly rendered file into the cache and enforce the quota."""
+        path = self.path_for(key)
+        staging = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        shutil.move(source, staging)
+        os.replace(staging, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Delete least-recently-used entries until the cache fits in its quota."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._digests.pop(os.path.basename(path).split(".")[0], None)
+                total -= size
+
+
+def link_file(source: str, target: str) -> bool:
+    """
+    Atomically place source at target, hardlinking where the filesystem allows it.
+    Returns False if the target already exists or the source disappeared.
+    """
+    try:
+        os.link(source, target)
+        return True
+    except FileExistsError:
+        return False
+    except FileNotFoundError:
+        return False
+    except OSError:
+        # Different filesystems (or no hardlink support): copy, then rename into place.
+        staging = os.path.join(os.path.dirname(target), f".{uuid.uuid4().hex}.tmp")
+        try:
+            shutil.copyfile(source, staging)
+            os.replace(staging, target)
+            return True
+        except FileNotFoundError:
+            return False
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
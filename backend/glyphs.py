@@ -0,0 +1,92 @@
+"""
+Persistent, process-shared cache of typeset LaTeX snippets.
+
+manim compiles every MathTex string to an SVG file named by a hash of the
+source in its tex_dir, and skips LaTeX entirely when that SVG already exists.
+The glyph cache is a shared directory of those SVGs, bounded by a disk quota
+like the render caches: when manim is about to typeset a string whose SVG is
+missing from the render's tex_dir, the SVG is linked in from the cache if it
+is there, and SVGs compiled anyway are published back after the render, so a
+string is typeset once per deployment rather than once per process.
+"""
+
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, List, Set
+
+from cache import RenderCache, link_file
+
+# manim names SVGs by a hex digest of the LaTeX source.
+GLYPH_KEY_PATTERN = re.compile(r"[0-9a-f]{8,64}")
+
+
+class GlyphCache:
+    """A shared directory of compiled LaTeX SVGs, linked into tex_dirs on demand."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        """Initialize the cache, creating its directory if needed."""
+        self.cache = RenderCache(directory, max_bytes, extension="svg",
+                                 key_pattern=GLYPH_KEY_PATTERN)
+        self._compiled: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._attached = False
+
+    def attach(self) -> None:
+        """
+        Hook the cache into manim's tex file writing, once per process: every SVG
+        manim looks for in a tex_dir is first looked up in the cache.
+        """
+        from manim.utils import tex_file_writing
+
+        with self._lock:
+            if self._attached:
+                return
+            generate_tex_file = tex_file_writing.generate_tex_file
+
+            def generate_cached(*args: Any, **kwargs: Any) -> Path:
+                tex_file = generate_tex_file(*args, **kwargs)
+                self.fetch(Path(tex_file).with_suffix(".svg"))
+                return tex_file
+
+            tex_file_writing.generate_tex_file = generate_cached
+            self._attached = True
+
+    def fetch(self, svg_file: Path) -> bool:
+        """
+        Link the cached SVG into place if svg_file is missing; returns False if it is
+        not cached either, in which case manim compiles it and publish() shares it.
+        """
+        if svg_file.exists():
+            return True
+        source = self.cache.get(svg_file.stem)
+        if source is not None and link_file(source, str(svg_file)):
+            return True
+        with self._lock:
+            self._compiled.add(svg_file)
+        return False
+
+    def publish(self) -> int:
+        """Add the SVGs compiled since the last publish to the cache; returns the number added."""
+        with self._lock:
+            compiled, self._compiled = self._compiled, set()
+        published = 0
+        for svg_file in compiled:
+            if not GLYPH_KEY_PATTERN.fullmatch(svg_file.stem):
+                continue
+            staging = os.path.join(self.cache.directory, f".{uuid.uuid4().hex}.tmp")
+            if link_file(str(svg_file), staging):
+                os.replace(staging, self.cache.path_for(svg_file.stem))
+                published += 1
+        if published:
+            self.cache.evict()
+        return published
+
+
+def common_glyphs(symbols: Iterable[str] = ()) -> List[str]:
+    """Return the tex strings that nearly every scene typesets."""
+    numbers = [str(value) for value in range(-10, 101)]
+    numbers += [f"{value}.0" for value in range(-10, 11)]
+    return numbers + [r"\vdots", r"\cdots", r"\ddots", "="] + list(symbols)
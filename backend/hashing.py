@@ -0,0 +1,45 @@
+"""Stable content hashing for operation inputs and render settings."""
+
+import hashlib
+from typing import Any
+import numpy as np
+
+
+def _feed(digest: Any, value: Any) -> None:
+    """Feed a value into the digest with a type tag so that different values never collide."""
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            _feed(digest, value.tolist())
+            return
+        data = np.ascontiguousarray(value).tobytes()
+        digest.update(
+            f"ndarray:{value.dtype.str}:{value.shape}:{len(data)}:".encode())
+        digest.update(data)
+    elif isinstance(value, np.generic):
+        _feed(digest, np.asarray(value))
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}:{len(value)}:".encode())
+        for item in value:
+            _feed(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict:{len(value)}:".encode())
+        for key in sorted(value, key=str):
+            _feed(digest, str(key))
+            _feed(digest, value[key])
+    elif isinstance(value, type):
+        _feed(digest, f"{value.__module__}.{value.__qualname__}")
+    else:
+        text = repr(value)
+        digest.update(f"{type(value).__name__}:{len(text)}:{text}".encode())
+
+
+def content_hash(*parts: Any) -> str:
+    """
+    Compute a hex digest identifying the given values by content.
+
+    Arrays are hashed by dtype, shape and raw bytes; containers are hashed recursively.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        _feed(digest, part)
+    return digest.hexdigest()
@@ -0,0 +1,127 @@
+"""Background render jobs so that request threads never wait on manim."""
+
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from parse import OperationNode
+from render import RENDER_ADMISSION, RENDER_WORKERS, render_step
+
+QUEUED = "queued"
+RENDERING = "rendering"
+DONE = "done"
+FAILED = "failed"
+
+# Number of finished jobs whose status is kept around for polling clients.
+JOB_HISTORY = int(os.environ.get('JOB_HISTORY', 1000))
+
+logger = logging.getLogger(__name__)
+
+
+class RenderJob:
+    """Class representing the background render of a single operation step."""
+
+    def __init__(self, index: int, operation: str, preview: bool = False) -> None:
+        """Initialize a queued render job; preview jobs render a still image."""
+        self.job_id = uuid.uuid4().hex
+        self.index = index
+        self.operation = operation
+        self.preview = preview
+        self.status = QUEUED
+        self.video_id: Optional[str] = None
+        self.error: Optional[str] = None
+        # Completes (with None) once the job is done or failed.
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON-serializable status of the job."""
+        job = {
+            "job_id": self.job_id,
+            "step": self.index,
+            "operation": self.operation,
+            "status": self.status,
+        }
+        if self.video_id and self.preview:
+            job["preview_url"] = f"/preview/{self.video_id}"
+        elif self.video_id:
+            job["video_url"] = f"/video/{self.video_id}"
+        if self.error:
+            job["error"] = self.error
+        return job
+
+
+class JobQueue:
+    """
+    A queue of render jobs processed by background threads.
+    Every job holds an admission (see RENDER_ADMISSION) until it finishes, so
+    submitting beyond the render queue's depth raises RenderQueueFull.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS) -> None:
+        """Initialize the queue; workers > 1 renders in the process pool."""
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix="render-job")
+        self._jobs: "OrderedDict[str, RenderJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, node: OperationNode, index: int,
+               options: Optional[Dict[str, Any]] = None) -> RenderJob:
+        """Queue the render of a computed operation node and return its job."""
+        return self.submit_all([(node, index)], options)[0]
+
+    def submit_all(self, steps: List[Tuple[OperationNode, int]],
+                   options: Optional[Dict[str, Any]] = None,
+                   admitted: bool = False) -> List[RenderJob]:
+        """
+        Queue the renders of computed operation nodes, given with their step
+        indices, and return their jobs. Either all are admitted or none is queued;
+        if admitted, the caller already holds an admission per step, which the
+        jobs take over.
+        """
+        if not admitted:
+            RENDER_ADMISSION.acquire(len(steps))
+        jobs = []
+        for node, index in steps:
+            job = RenderJob(index, node.operation, bool((options or {}).get("preview")))
+            with self._lock:
+                self._jobs[job.job_id] = job
+                self._prune()
+            job.future = self._executor.submit(self._run, job, node, options)
+            jobs.append(job)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        """Return the job with the given ID, or None if it is unknown."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: RenderJob, node: OperationNode,
+             options: Optional[Dict[str, Any]]) -> None:
+        """Render the job's step, record the outcome and give back its admission."""
+        job.status = RENDERING
+        try:
+            job.video_id = render_step(node, job.index, options, self.workers)
+            job.status = DONE
+        except Exception as e:
+            logger.exception("Render job %s failed", job.job_id)
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            RENDER_ADMISSION.release()
+
+    def depth(self) -> int:
+        """Return the number of jobs queued or rendering."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in (QUEUED, RENDERING))
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit."""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
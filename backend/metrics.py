@@ -0,0 +1,289 @@
+"""
+Minimal Prometheus instrumentation: counters, gauges and histograms with
+labels, rendered in the Prometheus text exposition format.
+
+Metrics live in the process that records them. Renders that run in pool
+workers drain their counters and histograms after each task and send them back
+with the result, and the web process merges them into its own (see
+Registry.drain and Registry.merge), so /metrics covers every render.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the latency histogram buckets, from parsing to full renders.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Format label pairs as {name="value",...}, escaping the values."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, writing integral values without a decimal point."""
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """Base class of labelled metrics."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        """Initialize a metric with the given label names."""
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        """Return the label values in declaration order."""
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Return the sample lines of the metric."""
+
+    def drain(self) -> Any:
+        """Return the values recorded since the last drain and reset them; None if empty."""
+        return None
+
+    def merge(self, values: Any) -> None:
+        """Add values drained from the same metric in another process."""
+
+    def render(self) -> str:
+        """Return the metric in the text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        """Initialize a counter at zero."""
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current count for the given labels."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def drain(self) -> Optional[Dict[LabelValues, float]]:
+        """Return the counts since the last drain and reset them."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values or None
+
+    def merge(self, values: Dict[LabelValues, float]) -> None:
+        """Add counts drained from another process."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def samples(self) -> List[str]:
+        """Return the sample lines of the counter."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in values]
+
+
+class Gauge(Metric):
+    """A value that can go up and down, optionally read from a callback when scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str,
+                 function: Optional[Callable[[], float]] = None) -> None:
+        """Initialize an unlabelled gauge, read from function if one is given."""
+        super().__init__(name, documentation)
+        self.function = function
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        with self._lock:
+            self._value = value
+
+    def samples(self) -> List[str]:
+        """Return the sample line of the gauge."""
+        value = self.function() if self.function is not None else self._value
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Initialize an empty histogram with the given bucket upper bounds."""
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the with-block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def wrap(self, function: Callable, **labels: str) -> Callable:
+        """Return function, with the duration of every call observed."""
+        def timed(*args, **kwargs):
+            with self.time(**labels):
+                return function(*args, **kwargs)
+        return timed
+
+    def drain(self) -> Optional[Dict[LabelValues, Tuple[List[int], float, int]]]:
+        """Return the observations since the last drain and reset them."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series or None
+
+    def merge(self, series: Dict[LabelValues, Tuple[List[int], float, int]]) -> None:
+        """Add observations drained from another process."""
+        with self._lock:
+            for key, (counts, total, count) in series.items():
+                own, own_total, own_count = self._series.get(
+                    key, ([0] * len(self.buckets), 0.0, 0))
+                self._series[key] = ([a + b for a, b in zip(own, counts)],
+                                     own_total + total, own_count + count)
+
+    def samples(self) -> List[str]:
+        """Return the bucket, sum and count lines of the histogram."""
+        with self._lock:
+            series = sorted((key, (list(counts), total, count))
+                            for key, (counts, total, count) in self._series.items())
+        lines = []
+        inf = 'le="+Inf"'
+        for key, (counts, total, count) in series:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.label_names, key, le)} {bucket_count}")
+            lines.append(f"{self.name}_bucket"
+                         f"{_format_labels(self.label_names, key, inf)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} "
+                         f"{_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class StageTimer:
+    """Accumulates the time spent in instrumented functions, e.g. during one render."""
+
+    def __init__(self) -> None:
+        """Initialize with no time recorded."""
+        self.elapsed = 0.0
+
+    def wrap(self, function: Callable) -> Callable:
+        """Return function, timed into this timer."""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.elapsed += time.perf_counter() - start
+        return timed
+
+
+class Registry:
+    """The metrics exposed by this process."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._metrics: List[Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric to the registry and return it."""
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Return every registered metric in the text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def drain(self) -> Dict[str, Any]:
+        """
+        Return the values recorded since the last drain, by metric name, and reset
+        them; used by worker processes to send their metrics to the web process.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        drained = {metric.name: metric.drain() for metric in metrics}
+        return {name: values for name, values in drained.items() if values is not None}
+
+    def merge(self, drained: Dict[str, Any]) -> None:
+        """Add values drained from the registry of another process."""
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            if metric.name in drained:
+                metric.merge(drained[metric.name])
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "numpyviz_stage_seconds",
+    "Time spent in each processing stage.", ["stage"]))
+OPERATIONS = REGISTRY.register(Counter(
+    "numpyviz_operations_total",
+    "Operations computed, by operation.", ["operation"]))
+RENDERS = REGISTRY.register(Counter(
+    "numpyviz_renders_total",
+    "Render requests by scene template and outcome (rendered, cached or failed).",
+    ["template", "outcome"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "numpyviz_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).", ["cache", "result"]))
@@ -2,9 +2,14 @@
 # pylint: disable=no-member
 
 import ast
-from typing import List, Dict, Any, Union
+import logging
+from typing import List, Dict, Any, Iterable, Iterator, Union
 import numpy as np
 
+from hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
 
 class OperationNode:
     """Class representing a node in the operation tree."""
@@ -83,6 +88,8 @@ class OperationNode:
         "flatten": np.ravel,  # type: ignore
         "ravel": np.ravel,
         "dot": np.dot,
+        "negative": np.negative,
+        "positive": np.positive,
     }
 
     def __init__(self, operation: str, operands: List[Any], **kwargs: Any) -> None:
@@ -91,6 +98,11 @@ class OperationNode:
         self.operands = operands
         self.kwargs = kwargs
         self.result = None
+        # The nodes this one depends on, kept after compute() unwraps the operands.
+        self.inputs = collect_nodes([operands, list(kwargs.values())])
+        # Structural identity: equal keys mean the same operation over the same inputs.
+        self.key = content_hash(operation, signature(operands),
+                                {k: signature(v) for k, v in kwargs.items()})
 
     def compute(self) -> Any:
         """Compute the result of the operation."""
@@ -115,13 +127,15 @@ class OperationNode:
         self.operands = [unwrap(op) for op in self.operands]
         self.kwargs = {k: unwrap(v) for k, v in self.kwargs.items()}
 
-        print(
-            f"Computing {self.operation} with args: {self.operands}, {self.kwargs}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Computing %s with args: %s, %s",
+                         self.operation, self.operands, self.kwargs)
         raw_result = op_func(*self.operands, **self.kwargs)
         # if raw_result.ndim == 1 or (raw_result.ndim == 2 and raw_result.shape[0] == 1):
         #     return raw_result.reshape(-1, 1)
         self.result = np.around(raw_result, 2)
-        print("Result: ", self.result)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Result: %s", self.result)
 
         return self.result
 
@@ -134,17 +148,85 @@ class ArrayNode(OperationNode):
         super().__init__("array", [])
         self.name = name
         self.result = value
+        self.inputs = collect_nodes([value])
+        self.key = content_hash("array", signature(value))
 
     def __repr__(self) -> str:
         """Return a string representation of the array node."""
         return f"ArrayNode({self.name})"
 
 
+def signature(value: Any) -> Any:
+    """Return a content-hashable stand-in for an operand, with nodes replaced by their keys."""
+    if isinstance(value, OperationNode):
+        return ("node", value.key)
+    elif isinstance(value, (list, tuple)):
+        return type(value)(signature(item) for item in value)
+    elif isinstance(value, ast.AST):
+        return ast.dump(value)
+    return value
+
+
+def collect_nodes(value: Any) -> List[OperationNode]:
+    """Return the operation nodes referenced by a (possibly nested) operand."""
+    if isinstance(value, OperationNode):
+        return [value]
+    elif isinstance(value, (list, tuple)):
+        return [node for item in value for node in collect_nodes(item)]
+    return []
+
+
+def topological_order(roots: Iterable[OperationNode]) -> List[OperationNode]:
+    """
+    Order the operations reachable from the roots so that every node comes after its inputs.
+    Array literals are traversed but not returned, as they need no computation.
+    """
+    ordered: List[OperationNode] = []
+    visited = set()
+
+    def visit(node: OperationNode) -> None:
+        if id(node) in visited:
+            return
+        visited.add(id(node))
+        for dependency in node.inputs:
+            visit(dependency)
+        if not isinstance(node, ArrayNode):
+            ordered.append(node)
+
+    for root in roots:
+        visit(root)
+    return ordered
+
+
+def iter_statements(body: List[ast.stmt]) -> Iterator[ast.stmt]:
+    """Yield the statements of a block and of its nested blocks in source order."""
+    for statement in body:
+        yield statement
+        for field in ("body", "orelse", "finalbody"):
+            yield from iter_statements(getattr(statement, field, []))
+
+
 def parse_numpy_code(code: str) -> List[OperationNode]:
-    """Parse a string of Numpy code into a list of operation nodes."""
+    """
+    Parse a string of Numpy code into a list of operation nodes.
+
+    The nodes form a DAG: structurally identical operations over the same inputs
+    are merged into one node, and the list is in dependency (topological) order,
+    so each unique computation appears exactly once.
+    """
     tree = ast.parse(code)
     nodes: Dict[str, Any] = {}
     operation_nodes: List[OperationNode] = []
+    interned: Dict[str, OperationNode] = {}
+
+    def intern(op_node: OperationNode) -> OperationNode:
+        """Return the existing node with the same key, or register the new one."""
+        if op_node.key in interned:
+            return interned[op_node.key]
+        interned[op_node.key] = op_node
+        if not isinstance(op_node, ArrayNode):
+            operation_nodes.append(op_node)
+        return op_node
 
     binary_ops: Dict[Any, str] = {
         ast.Add: "add",
@@ -169,21 +251,16 @@ def parse_numpy_code(code: str) -> List[OperationNode]:
         elif isinstance(node, ast.UnaryOp):
             op = unary_ops[type(node.op)]
             operand = parse_node(node.operand)
-            return -operand if op == "negative" and isinstance(operand, (int, float)) else OperationNode(op, [operand])
-            # return OperationNode(op, [operand])
+            return -operand if op == "negative" and isinstance(operand, (int, float)) else intern(OperationNode(op, [operand]))
         elif isinstance(node, (ast.List, ast.Tuple)):
             return [parse_node(elt) for elt in node.elts]
         elif isinstance(node, ast.BinOp) and type(node.op) in binary_ops:
             op = binary_ops[type(node.op)]
-            op_node = OperationNode(
-                op, [parse_node(node.left), parse_node(node.right)])
-            operation_nodes.append(op_node)
-            return op_node
+            return intern(OperationNode(
+                op, [parse_node(node.left), parse_node(node.right)]))
         elif isinstance(node, ast.Attribute) and node.attr == 'T':
             value = parse_node(node.value)
-            op_node = OperationNode("transpose", [value])
-            operation_nodes.append(op_node)
-            return op_node
+            return intern(OperationNode("transpose", [value]))
         elif isinstance(node, ast.Call):
             if (
                 isinstance(node.func, ast.Attribute)
@@ -196,29 +273,28 @@ def parse_numpy_code(code: str) -> List[OperationNode]:
                     operands = [nodes[node.func.value.id]] + \
                         [parse_node(arg) for arg in node.args]
                 kwargs = {kw.arg: parse_node(kw.value) for kw in node.keywords}
-                op_node = OperationNode(op, operands, **kwargs)
-                operation_nodes.append(op_node)
-                return op_node
+                return intern(OperationNode(op, operands, **kwargs))
             elif isinstance(node.func, ast.Attribute) and node.func.attr == "array":
-                return ArrayNode(f"array_{len(nodes)}", parse_node(node.args[0]))
+                return intern(ArrayNode(f"array_{len(nodes)}", parse_node(node.args[0])))
         return node
 
-    for node in ast.walk(tree):
+    for node in iter_statements(tree.body):
         if isinstance(node, ast.Assign):
             target = node.targets[0].id
             nodes[target] = parse_node(node.value)
         elif isinstance(node, ast.Expr):
             parse_node(node.value)
 
-    return operation_nodes
+    return topological_order(operation_nodes)
 
 
 def parse(code: str) -> List[OperationNode]:
     """Entry point for parsing Numpy code."""
     operation_nodes = parse_numpy_code(code)
 
-    print("\nOperation Nodes:")
-    for node in operation_nodes:
-        print(f"Operands: {node.operands}, Keyword Args: {node.kwargs}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Operation Nodes:")
+        for node in operation_nodes:
+            logger.debug("Operands: %s, Keyword Args: %s", node.operands, node.kwargs)
 
     return operation_nodes
@@ -0,0 +1,751 @@
+"""
+This module renders operation nodes into manim animations, either in the
+calling process or in a pool of worker processes.
+"""
+
+import inspect
+import logging
+import multiprocessing.util
+import os
+import resource
+import shutil
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from manim import MathTex, tempconfig
+
+from parse import OperationNode
+from admission import Admission
+from cache import RenderCache
+from glyphs import GlyphCache, common_glyphs
+from hashing import content_hash
+from metrics import CACHE_REQUESTS, REGISTRY, RENDERS, STAGE_SECONDS, StageTimer
+from segments import SegmentCache
+from singleflight import SingleFlight
+from specs import load_spec, save_spec
+from storage import LocalStore, SharedDirectoryStore
+from workers import WorkerPool
+from templates.broadcast import BroadcastingAnimation
+from templates.split import SplitOperation
+from templates.transpose import MatrixTransposition
+from templates.elementwise import OPS, ElementWiseOperation
+from templates.matmul import MatrixMultiplication
+from templates.reduction import ReductionOperation
+from templates.concat import ConcatenationOperation
+from templates.reshape import (ExpandDimsOperation, FlattenOperation,
+                               RavelOperation, ReshapeOperation, SqueezeOperation)
+from templates.utils import MAX_VISIBLE, NUMBER_RENDERER, TEMPLATE_VERSION
+from tracing import trace_numpy_code
+
+ELEMENTWISE_OPS = ["add", "subtract", "multiply", "divide", "floor_divide", "mod", "power",
+                   "sin", "cos", "tan", "arcsin", "arccos", "arctan", "sinh", "cosh", "tanh",
+                   "arcsinh", "arccosh", "arctanh", "exp", "expm1", "exp2", "log", "log10",
+                   "log2", "log1p", "round", "floor", "ceil", "trunc", "sqrt", "cbrt",
+                   "square", "abs", "fabs", "sign", "heaviside", "maximum", "minimum"]
+
+MEDIA_DIR = os.path.join(os.getcwd(), 'media')
+# Every render writes its movie files to a private scratch directory below this one.
+RENDERS_DIR = os.path.join(MEDIA_DIR, 'renders')
+os.makedirs(RENDERS_DIR, exist_ok=True)
+
+RENDER_CACHE = RenderCache(os.path.join(MEDIA_DIR, 'cache'),
+                           int(os.environ.get('RENDER_CACHE_MAX_BYTES', 1 << 30)))
+
+# Video formats a step can be encoded to, with their MIME types.
+VIDEO_FORMATS = {"mp4": "video/mp4", "webm": "video/webm", "gif": "image/gif"}
+
+# Rendered videos by format, each format with its own directory and quota.
+VIDEO_CACHES = {
+    "mp4": RENDER_CACHE,
+    **{fmt: RenderCache(os.path.join(MEDIA_DIR, f'cache-{fmt}'),
+                        int(os.environ.get('RENDER_CACHE_MAX_BYTES', 1 << 30)), extension=fmt)
+       for fmt in VIDEO_FORMATS if fmt != "mp4"}
+}
+
+# Last-frame stills of the same steps, keyed like the videos.
+PREVIEW_CACHE = RenderCache(os.path.join(MEDIA_DIR, 'previews'),
+                            int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', 256 << 20)),
+                            extension="png")
+
+# Render specifications of steps whose output is produced when first requested, up to
+# PENDING_MAX_BYTES. Once a step's specification is evicted before its output was
+# rendered, its URL answers 410 and the client has to submit the code again.
+PENDING_RENDERS = RenderCache(os.path.join(MEDIA_DIR, 'pending'),
+                              int(os.environ.get('PENDING_MAX_BYTES', 64 << 20)),
+                              extension="npz")
+
+# Where rendered outputs and pending render specifications are shared between hosts:
+# a directory all hosts mount, or, if SHARED_STORE_DIR is unset, nowhere beyond this host.
+SHARED_STORE_DIR = os.environ.get('SHARED_STORE_DIR')
+ARTIFACT_STORE = (SharedDirectoryStore(SHARED_STORE_DIR,
+                                       int(os.environ.get('SHARED_STORE_MAX_BYTES', 8 << 30)))
+                  if SHARED_STORE_DIR else LocalStore(os.path.join(MEDIA_DIR, 'locks')))
+
+# Typeset LaTeX snippets shared between all processes and renders.
+GLYPH_CACHE = GlyphCache(os.path.join(MEDIA_DIR, 'glyphs'),
+                         int(os.environ.get('GLYPH_CACHE_MAX_BYTES', 128 << 20)))
+
+# Number of worker processes used to render steps; 1 renders in the calling process,
+# unless render limits are set, which are enforced in a single worker process instead.
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 1))
+
+# Typeset common numbers and symbols before serving, in the web process or in every
+# render worker as it starts (set to 0 to disable).
+GLYPH_WARMUP = int(os.environ.get('GLYPH_WARMUP', 1))
+
+# Renders a worker process serves (on average) before the pool is replaced by a fresh one.
+RENDER_WORKER_MAX_TASKS = int(os.environ.get('RENDER_WORKER_MAX_TASKS', 50))
+
+# Peak resident memory (in MiB) after which the whole worker pool is replaced.
+RENDER_WORKER_MAX_RSS_MB = int(os.environ.get('RENDER_WORKER_MAX_RSS_MB', 1024))
+
+# CPU seconds one render may use, and address space (in MiB, which exceeds resident
+# memory) of a render worker; 0 disables the limit.
+RENDER_CPU_SECONDS = int(os.environ.get('RENDER_CPU_SECONDS', 120))
+RENDER_MEMORY_MB = int(os.environ.get('RENDER_MEMORY_MB', 4096))
+
+# Renders waiting beyond the ones being rendered; more are refused with RenderQueueFull,
+# telling the client to retry after RENDER_RETRY_AFTER seconds.
+RENDER_QUEUE_DEPTH = int(os.environ.get('RENDER_QUEUE_DEPTH', 16))
+RENDER_RETRY_AFTER = int(os.environ.get('RENDER_RETRY_AFTER', 10))
+RENDER_ADMISSION = Admission(max(1, RENDER_WORKERS) + RENDER_QUEUE_DEPTH, RENDER_RETRY_AFTER)
+
+# CPU seconds a snippet run by the tracing front end may use, in a worker process
+# capped at RENDER_MEMORY_MB; 0 runs snippets in the calling process without limits.
+TRACE_CPU_SECONDS = int(os.environ.get('TRACE_CPU_SECONDS', 10))
+# Worker processes running traced snippets.
+TRACE_WORKERS = int(os.environ.get('TRACE_WORKERS', 2))
+
+# Default settings that change the rendered pixels; the settings of each render
+# (see output_settings) are part of its cache key, as is the number renderer.
+RENDER_QUALITY = {
+    "format": "mp4",
+    "quality": "low_quality",
+    "frame_rate": 5,
+    "pixel_width": 854,
+    "pixel_height": 480
+}
+
+# Frame sizes (width, height) selectable with the "quality" option. "auto" picks the
+# smallest one that keeps the scene's largest matrix legible (see scene_extent).
+RESOLUTIONS = {
+    "small": (480, 270),
+    "low": (854, 480),
+    "medium": (1280, 720),
+}
+# Largest number of visible rows or columns drawn at the "small" size.
+SMALL_SCENE_EXTENT = int(os.environ.get('SMALL_SCENE_EXTENT', 3))
+
+# Segments are cached by manim's play-call hashes; keep them all until the render is harvested.
+SEGMENT_CONFIG = {
+    "disable_caching": False,
+    "max_files_cached": 10000
+}
+
+# Movie segments of individual play() calls, reused by every render that repeats them,
+# by the extension manim writes them with (GIFs are combined from mp4 segments).
+SEGMENT_CACHE = SegmentCache(os.path.join(MEDIA_DIR, 'segments'),
+                             int(os.environ.get('SEGMENT_CACHE_MAX_BYTES', 512 << 20)),
+                             extension=RENDER_QUALITY["format"])
+SEGMENT_CACHES = {
+    "mp4": SEGMENT_CACHE,
+    "webm": SegmentCache(os.path.join(MEDIA_DIR, 'segments-webm'),
+                         int(os.environ.get('SEGMENT_CACHE_MAX_BYTES', 512 << 20)),
+                         extension="webm"),
+}
+
+# CPU seconds allowed to the task the current worker runs, for the SIGXCPU message.
+_cpu_seconds: Optional[int] = None
+_deferred_flights = SingleFlight()
+# Renders in progress in this process, by render key and preview flag.
+_render_flights = SingleFlight()
+
+# Overrides that make manim skip the animations and save only the final frame.
+PREVIEW_CONFIG = {
+    "save_last_frame": True,
+    "write_to_movie": False
+}
+
+# SceneFileWriter methods that write frames to ffmpeg or combine the movie.
+ENCODE_METHODS = ("write_frame", "end_animation", "combine_to_movie")
+
+# manim's config is global to the process, so only one scene renders at a time per process.
+_render_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+class RenderLimitExceeded(RuntimeError):
+    """Raised when a render used more CPU time or memory than it is allowed."""
+
+
+def scene_template(node: OperationNode,
+                   options: Optional[Dict[str, Any]] = None) -> Optional[Tuple[type, Dict[str, Any]]]:
+    """
+    Selects the scene class that animates the given operation node.
+    Returns the class with the extra keyword arguments it expects, including the
+    scene options that the class accepts, or None if the operation is not supported.
+    """
+    template = _select_template(node)
+    if template is None:
+        return None
+    scene_class, template_kwargs = template
+    accepted = inspect.signature(scene_class.__init__).parameters
+    template_kwargs.update({name: value for name, value in (options or {}).items()
+                            if name in accepted})
+    return scene_class, template_kwargs
+
+
+def _select_template(node: OperationNode) -> Optional[Tuple[type, Dict[str, Any]]]:
+    """Maps the node's operation to its scene class and operation-specific arguments."""
+    operation = node.operation
+    if operation in ELEMENTWISE_OPS:
+        return ElementWiseOperation, {"operation": operation, "result": node.result}
+    elif operation in ["matmul", "dot"]:
+        return MatrixMultiplication, {}
+    elif operation in ["sum", "mean", "max", "min", "median", "std", "var", "prod", "average"]:
+        return ReductionOperation, {"operation": operation, "result": node.result}
+    elif operation == "reshape":
+        return ReshapeOperation, {"result": node.result}
+    elif operation == "ravel":
+        return RavelOperation, {"result": node.result}
+    elif operation == "flatten":
+        return FlattenOperation, {"result": node.result}
+    elif operation == "squeeze":
+        return SqueezeOperation, {"result": node.result}
+    elif operation == "expand_dims":
+        return ExpandDimsOperation, {"result": node.result}
+    elif operation == "concatenate":
+        return ConcatenationOperation, {"result": node.result}
+    elif operation == "split":
+        return SplitOperation, {"result": node.result}
+    elif operation == "transpose":
+        return MatrixTransposition, {}
+    elif operation == "broadcast_to":
+        return BroadcastingAnimation, {"result": node.result}
+    return None
+
+
+def scene_extent(node: OperationNode) -> int:
+    """Returns the most rows or columns any matrix of the step shows on screen."""
+    def extent(value: Any) -> int:
+        if isinstance(value, (list, tuple)) and any(isinstance(item, np.ndarray) for item in value):
+            return max((extent(item) for item in value), default=0)
+        shape = np.atleast_2d(np.asarray(value)).shape
+        return max(min(size, MAX_VISIBLE) for size in shape[-2:])
+
+    values = [operand for operand in node.operands if not isinstance(operand, (int, float))]
+    return max((extent(value) for value in values + [node.result]), default=0)
+
+
+def output_settings(node: OperationNode,
+                    options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Returns the manim settings for rendering a computed node: the video "format"
+    option (one of VIDEO_FORMATS, mp4 by default) and the frame size, from the
+    "quality" option or, with "auto" (the default), from the scene's extent.
+    Raises ValueError for unknown formats and qualities.
+    """
+    options = options or {}
+    fmt = options.get("format", RENDER_QUALITY["format"])
+    if fmt == "svg":
+        raise ValueError("Animated SVG output is not supported; "
+                         "use the timeline backend for vector animations")
+    if fmt not in VIDEO_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    quality = options.get("quality", "auto")
+    if quality == "auto":
+        quality = "small" if scene_extent(node) <= SMALL_SCENE_EXTENT else "low"
+    if quality not in RESOLUTIONS:
+        raise ValueError(f"Unsupported quality: {quality}")
+    width, height = RESOLUTIONS[quality]
+    return {**RENDER_QUALITY, "format": fmt, "pixel_width": width, "pixel_height": height}
+
+
+def render_template(node: OperationNode, options: Optional[Dict[str, Any]] = None
+                    ) -> Optional[Tuple[str, type, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Selects the scene for a computed node and derives its render key, a hash of
+    everything that affects the rendered output.
+    Returns the key with the scene class, its arguments and the output settings,
+    or None if the operation is not supported.
+    """
+    for operand in node.operands:
+        if not isinstance(operand, (np.ndarray, list, tuple, int, float)):
+            raise ValueError(f"Invalid operand type: {type(operand)}")
+
+    template = scene_template(node, options)
+    if template is None:
+        return None
+    scene_class, template_kwargs = template
+    settings = output_settings(node, options)
+    key = content_hash(node.operation, node.operands, node.kwargs, scene_class,
+                       template_kwargs, settings, NUMBER_RENDERER, MAX_VISIBLE,
+                       TEMPLATE_VERSION)
+    return key, scene_class, template_kwargs, settings
+
+
+def generate_manim_animation(node: OperationNode, index: int,
+                             options: Optional[Dict[str, Any]] = None,
+                             media_dir: str = MEDIA_DIR) -> Optional[str]:
+    """
+    Generates a manim animation (or, with the "preview" option, a still of its last
+    frame) for the given operation node, unless the output is already cached or in
+    ARTIFACT_STORE; outputs are keyed by a hash of everything that affects them.
+    Returns the cache key of the output, or None if the operation is not supported.
+    """
+    preview = bool((options or {}).get("preview"))
+
+    template = render_template(node, options)
+    if template is None:
+        return None
+    key, scene_class, template_kwargs, settings = template
+
+    cache = PREVIEW_CACHE if preview else VIDEO_CACHES[settings["format"]]
+    cache_name = "preview" if preview else "video"
+    template_name = scene_class.__name__
+    if cache.get(key) or ARTIFACT_STORE.fetch(cache, key):
+        logger.debug("cache hit: %s", key)
+        CACHE_REQUESTS.inc(cache=cache_name, result="hit")
+        RENDERS.inc(template=template_name, outcome="cached")
+        return key
+    CACHE_REQUESTS.inc(cache=cache_name, result="miss")
+
+    with ARTIFACT_STORE.lock(cache, key):
+        # Another process may have rendered it while this one waited for the lock
+        if cache.get(key) or ARTIFACT_STORE.fetch(cache, key):
+            RENDERS.inc(template=template_name, outcome="cached")
+            return key
+        _render_scene(key, scene_class, template_kwargs, node, index, settings, preview,
+                      cache, media_dir)
+        ARTIFACT_STORE.publish(cache, key)
+    return key
+
+
+def _render_scene(key: str, scene_class: type, template_kwargs: Dict[str, Any],
+                  node: OperationNode, index: int, settings: Dict[str, Any], preview: bool,
+                  cache: RenderCache, media_dir: str) -> None:
+    """
+    Renders a scene in a private scratch directory and puts its output into the cache.
+    Records the "construct" stage (the scene's construct(), without the frames it
+    writes), the "encode" stage (writing frames to ffmpeg and combining the movie)
+    and the whole "render".
+    """
+    op_args = node.operands
+    kwargs = node.kwargs
+    output_file = f'Visualization_{index}'
+    template_name = scene_class.__name__
+
+    scratch_dir = os.path.join(RENDERS_DIR, f"{key}-{uuid.uuid4().hex}")
+    video_dir = os.path.join(scratch_dir, "videos")
+    images_dir = os.path.join(scratch_dir, "images")
+    custom_config = {
+        "output_file": output_file,
+        "media_dir": media_dir,
+        "video_dir": video_dir,
+        "images_dir": images_dir,
+        "tex_dir": os.path.join(media_dir, "Tex"),
+        "text_dir": os.path.join(media_dir, "texts"),
+        "partial_movie_dir": os.path.join(scratch_dir, "partial_movie_files"),
+        **settings,
+        **SEGMENT_CONFIG,
+        **(PREVIEW_CONFIG if preview else {})
+    }
+    if preview:
+        output_path = os.path.join(images_dir, f"{output_file}.png")
+    else:
+        output_path = os.path.join(video_dir, f"{output_file}.{settings['format']}")
+
+    GLYPH_CACHE.attach()
+    try:
+        with _render_lock, tempconfig(custom_config):
+            scene = scene_class(*op_args, **template_kwargs, **kwargs)
+            file_writer = scene.renderer.file_writer
+            extension = getattr(file_writer, "movie_file_extension", ".mp4").lstrip(".")
+            segments = SEGMENT_CACHES.get(extension)
+            if segments is not None:
+                segments.attach(file_writer)
+            encode = StageTimer()
+            for name in ENCODE_METHODS:
+                if hasattr(file_writer, name):
+                    setattr(file_writer, name, encode.wrap(getattr(file_writer, name)))
+            construct = scene.construct
+
+            def timed_construct() -> None:
+                start, encoded = time.perf_counter(), encode.elapsed
+                construct()
+                # Frames are written while construct() plays the animations
+                STAGE_SECONDS.observe(time.perf_counter() - start - (encode.elapsed - encoded),
+                                      stage="construct")
+
+            scene.construct = timed_construct
+            logger.info("rendering %s (%s)", key, template_name)
+
+            with STAGE_SECONDS.time(stage="render"):
+                scene.render()
+            STAGE_SECONDS.observe(encode.elapsed, stage="encode")
+        if segments is not None:
+            segments.harvest(custom_config["partial_movie_dir"])
+        cache.put(key, output_path)
+        RENDERS.inc(template=template_name, outcome="rendered")
+    except Exception:
+        RENDERS.inc(template=template_name, outcome="failed")
+        raise
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        GLYPH_CACHE.publish()
+
+
+def generate_timeline(node: OperationNode,
+                      options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Describes the animation of a computed operation node as a JSON timeline for
+    the client to play, using the same scene template as the video but without
+    rendering anything.
+    Returns None if the operation is not supported.
+    """
+    template = scene_template(node, options)
+    if template is None:
+        return None
+    scene_class, template_kwargs = template
+    scene = scene_class(*node.operands, **template_kwargs, **node.kwargs)
+    return scene.timeline()
+
+
+def warm_up_glyphs(media_dir: str = MEDIA_DIR) -> None:
+    """
+    Typesets the numbers and symbols used by almost every scene and publishes them
+    to the glyph cache, so that first renders do not wait on LaTeX for them.
+    """
+    tex_dir = os.path.join(media_dir, "Tex")
+    symbols = [symbol for _, symbol in OPS.values()]
+    try:
+        GLYPH_CACHE.attach()
+        with _render_lock, tempconfig({"media_dir": media_dir, "tex_dir": tex_dir}):
+            for tex in common_glyphs(symbols):
+                MathTex(tex)
+    except Exception as e:
+        logger.warning("Glyph warm-up failed: %s", e)
+    finally:
+        GLYPH_CACHE.publish()
+
+
+def worker_media_dir(pid: Optional[int] = None) -> str:
+    """Returns the media directory private to a worker process (default: the current one)."""
+    return os.path.join(MEDIA_DIR, "workers", str(pid or os.getpid()))
+
+
+def prune_worker_dirs() -> None:
+    """
+    Removes the media directories of worker processes that are gone without
+    cleaning up after themselves, e.g. because they were killed.
+    """
+    workers_dir = os.path.dirname(worker_media_dir())
+    if not os.path.isdir(workers_dir):
+        return
+    for name in os.listdir(workers_dir):
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(workers_dir, name), ignore_errors=True)
+        except (ValueError, PermissionError):
+            continue
+
+
+def use_pool(workers: int) -> bool:
+    """Returns whether steps render in the worker pool rather than in the calling process."""
+    return workers > 1 or RENDER_CPU_SECONDS > 0 or RENDER_MEMORY_MB > 0
+
+
+def _cpu_time_exceeded(signum: int, frame: Any) -> None:
+    """SIGXCPU handler: aborts the current task."""
+    raise RenderLimitExceeded(f"Exceeded the CPU time limit of {_cpu_seconds}s")
+
+
+def limit_worker() -> None:
+    """
+    Caps the address space of a fresh worker at RENDER_MEMORY_MB and aborts
+    tasks that exceed the CPU time given to set_cpu_limit.
+    """
+    if RENDER_MEMORY_MB > 0:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = RENDER_MEMORY_MB << 20
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    signal.signal(signal.SIGXCPU, _cpu_time_exceeded)
+
+
+def init_worker() -> None:
+    """
+    Prepares a fresh pool worker before it serves any render.
+    Applies the worker limits; importing this module already loaded manim and
+    the templates, and this also typesets the common glyphs, so the first
+    render in the worker starts warm.
+    """
+    limit_worker()
+    # A forked worker starts with a copy of the web process's metrics; drop them so
+    # that only the worker's own are sent back with its results.
+    REGISTRY.drain()
+    # Workers are replaced every RENDER_WORKER_MAX_TASKS renders; each removes its
+    # media directory when it exits (pool workers do not run atexit hooks).
+    multiprocessing.util.Finalize(None, shutil.rmtree, args=(worker_media_dir(), True),
+                                  exitpriority=0)
+    if GLYPH_WARMUP:
+        warm_up_glyphs(worker_media_dir())
+
+
+def set_cpu_limit(seconds: Optional[int]) -> None:
+    """
+    Makes the kernel signal SIGXCPU once the current process has used another
+    `seconds` of CPU time; None lifts the limit.
+    """
+    global _cpu_seconds
+    _cpu_seconds = seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = resource.RLIM_INFINITY
+    if seconds is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident memory of the current process in MiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def render_in_worker(node: OperationNode, index: int, options: Optional[Dict[str, Any]] = None
+                     ) -> Tuple[Optional[str], float, Dict[str, Any]]:
+    """
+    Renders a step inside a pool worker.
+    Each worker process keeps its Tex and text caches in its own media subdirectory.
+    Each render may use RENDER_CPU_SECONDS of CPU time; a render over its CPU
+    or memory limit raises RenderLimitExceeded and leaves the worker usable.
+    Returns the video cache key, the worker's peak memory use in MiB and the
+    metrics recorded in the worker since its last result.
+    """
+    if RENDER_CPU_SECONDS > 0:
+        set_cpu_limit(RENDER_CPU_SECONDS)
+    try:
+        key = generate_manim_animation(node, index, options, worker_media_dir())
+    except MemoryError as e:
+        raise RenderLimitExceeded(
+            f"Render exceeded its memory limit of {RENDER_MEMORY_MB} MiB") from e
+    finally:
+        set_cpu_limit(None)
+    return key, peak_rss_mb(), REGISTRY.drain()
+
+
+def trace_in_worker(code: str) -> List[OperationNode]:
+    """Traces a snippet inside a trace worker, within TRACE_CPU_SECONDS of CPU time."""
+    set_cpu_limit(TRACE_CPU_SECONDS)
+    try:
+        return trace_numpy_code(code)
+    except MemoryError as e:
+        raise RenderLimitExceeded(
+            f"Snippet exceeded its memory limit of {RENDER_MEMORY_MB} MiB") from e
+    finally:
+        set_cpu_limit(None)
+
+
+def trace_snippet(code: str) -> List[OperationNode]:
+    """
+    The tracing front end: runs a snippet with trace_numpy_code in a worker
+    limited to TRACE_CPU_SECONDS of CPU time and RENDER_MEMORY_MB, so that a
+    runaway snippet fails on its own instead of taking the web process down.
+    """
+    if TRACE_CPU_SECONDS <= 0:
+        return trace_numpy_code(code)
+    executor, future = TRACE_POOL.submit(trace_in_worker, code)
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        logger.error("Trace worker died: %s", e)
+        TRACE_POOL.recycle(executor)
+        raise RenderLimitExceeded("Snippet worker died, most likely over its memory limit") from e
+
+
+# Render workers start with a fresh interpreter, preloaded by init_worker; creating a
+# pool also removes the media directories left behind by workers that died.
+RENDER_POOL = WorkerPool("render", RENDER_WORKERS, init_worker, RENDER_WORKER_MAX_TASKS,
+                         prepare=prune_worker_dirs)
+TRACE_POOL = WorkerPool("trace", TRACE_WORKERS, limit_worker, RENDER_WORKER_MAX_TASKS)
+
+
+def _worker_result(executor: ProcessPoolExecutor,
+                   result: Tuple[Optional[str], float, Dict[str, Any]]) -> Optional[str]:
+    """
+    Unpacks a worker's result, adding its metrics to this process's and
+    recycling the pool if the worker grew too large.
+    """
+    key, rss_mb, metrics = result
+    REGISTRY.merge(metrics)
+    if rss_mb > RENDER_WORKER_MAX_RSS_MB:
+        RENDER_POOL.recycle(executor)
+    return key
+
+
+def _worker_died(executor: ProcessPoolExecutor, error: BrokenProcessPool) -> RenderLimitExceeded:
+    """Replaces a pool broken by a dying worker and returns the error for its renders."""
+    logger.error("Render worker died: %s", error)
+    RENDER_POOL.recycle(executor)
+    return RenderLimitExceeded("Render worker died, most likely over its memory limit")
+
+
+def render_step(node: OperationNode, index: int,
+                options: Optional[Dict[str, Any]] = None,
+                workers: int = RENDER_WORKERS) -> Optional[str]:
+    """
+    Renders a single computed operation node, in the worker pool unless there is
+    one worker and no render limits.
+    A render requested while the identical render (same key, both previews or
+    both videos) is already in progress in this process waits for that one and
+    shares its outcome instead of rendering again.
+    Admission is up to the caller (see RENDER_ADMISSION).
+    Returns the video cache key, or None if the operation is not supported.
+    Raises RenderLimitExceeded if the render ran out of CPU time or memory.
+    """
+    template = render_template(node, options)
+    if template is None:
+        return None
+    flight = (template[0], bool((options or {}).get("preview")))
+    return _render_flights.do(flight, lambda: _render_step(node, index, options, workers))
+
+
+def _render_step(node: OperationNode, index: int, options: Optional[Dict[str, Any]],
+                 workers: int) -> Optional[str]:
+    """Renders a single computed operation node, in this process or in the worker pool."""
+    if not use_pool(workers):
+        return generate_manim_animation(node, index, options)
+    executor, future = RENDER_POOL.submit(render_in_worker, node, index, options)
+    try:
+        return _worker_result(executor, future.result())
+    except BrokenProcessPool as e:
+        raise _worker_died(executor, e) from e
+
+
+def render_steps(operation_nodes: List[OperationNode],
+                 options: Optional[Dict[str, Any]] = None,
+                 workers: int = RENDER_WORKERS,
+                 errors: Optional[Dict[int, str]] = None) -> List[Optional[str]]:
+    """
+    Renders already computed operation nodes.
+    With more than one worker the steps are rendered in parallel in the worker pool;
+    identical steps, within the request or in progress for other requests, are
+    rendered once (see render_step).
+    The steps must all be admitted, or RenderQueueFull is raised before any renders.
+    If errors is given, a step that fails gets None and its error message under
+    its index in errors, and the other steps still render; otherwise the first
+    failure is raised.
+    Returns the video cache keys in the original step order.
+    """
+    def render(index: int) -> Optional[str]:
+        try:
+            return render_step(operation_nodes[index], index, options, workers)
+        except Exception as e:  # pylint: disable=broad-except
+            if errors is None:
+                raise
+            logger.exception("Rendering step %d failed", index)
+            errors[index] = str(e)
+            return None
+
+    with RENDER_ADMISSION.admit(len(operation_nodes)):
+        if not use_pool(workers) or len(operation_nodes) <= 1:
+            return [render(i) for i in range(len(operation_nodes))]
+        # One thread per step waits on the pool, so that every step can join an identical
+        # render already in progress (see render_step).
+        with ThreadPoolExecutor(max_workers=len(operation_nodes),
+                                thread_name_prefix="render-step") as threads:
+            return list(threads.map(render, range(len(operation_nodes))))
+
+
+def defer_steps(operation_nodes: List[OperationNode],
+                options: Optional[Dict[str, Any]] = None) -> List[Optional[str]]:
+    """
+    Registers already computed operation nodes for rendering on first request
+    instead of rendering them now (see render_deferred).
+    Returns the keys their outputs will be stored under, in step order.
+    """
+    keys = []
+    options = {name: value for name, value in (options or {}).items() if name != "preview"}
+    for index, node in enumerate(operation_nodes):
+        template = render_template(node, options)
+        if template is None:
+            keys.append(None)
+            continue
+        key = template[0]
+        if not PENDING_RENDERS.get(key):
+            # Only the computed state is kept, not the nodes it was derived from.
+            staging = os.path.join(RENDERS_DIR, f".{key}-{uuid.uuid4().hex}.npz")
+            with open(staging, "wb") as f:
+                save_spec(f, node, index, options)
+            PENDING_RENDERS.put(key, staging)
+            ARTIFACT_STORE.publish(PENDING_RENDERS, key)
+        keys.append(key)
+    return keys
+
+
+def cached_output(key: str, preview: bool = False, count: bool = False) -> Optional[str]:
+    """
+    Returns the path of a step's cached preview, or of its video in any format,
+    fetching it from ARTIFACT_STORE if another host rendered it.
+    With count, a hit is counted in CACHE_REQUESTS; a miss is counted by the
+    render that follows it (see generate_manim_animation), if the step is known.
+    """
+    path = _find_output(key, preview)
+    if path is not None and count:
+        CACHE_REQUESTS.inc(cache="preview" if preview else "video", result="hit")
+    return path
+
+
+def _find_output(key: str, preview: bool) -> Optional[str]:
+    """Looks a step's output up in the local caches, then in ARTIFACT_STORE."""
+    caches = [PREVIEW_CACHE] if preview else list(VIDEO_CACHES.values())
+    for cache in caches:
+        path = cache.get(key)
+        if path is not None:
+            return path
+    for cache in caches:
+        if ARTIFACT_STORE.fetch(cache, key):
+            return cache.get(key)
+    return None
+
+
+def render_deferred(key: str, preview: bool = False) -> Optional[str]:
+    """
+    Renders a step registered by defer_steps (on any host sharing ARTIFACT_STORE),
+    unless its output is already cached.
+    Concurrent requests for the same output share a single render, which must be
+    admitted (see RENDER_ADMISSION).
+    Returns the path of the cached output, or None if the key is unknown.
+    """
+    def render() -> Optional[str]:
+        path = cached_output(key, preview)
+        if path is not None:
+            return path
+        spec_path = PENDING_RENDERS.get(key)
+        if spec_path is None and ARTIFACT_STORE.fetch(PENDING_RENDERS, key):
+            spec_path = PENDING_RENDERS.get(key)
+        if spec_path is None:
+            return None
+        node, index, options = load_spec(spec_path)
+        if preview:
+            options = {**options, "preview": True}
+        with RENDER_ADMISSION.admit():
+            render_step(node, index, options)
+        return cached_output(key, preview)
+
+    return _deferred_flights.do((key, preview), render)
+
+
+def deferred_in_flight() -> int:
+    """Returns the number of deferred outputs being rendered right now."""
+    return _deferred_flights.in_flight()
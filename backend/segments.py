@@ -0,0 +1,68 @@
+"""
+Cross-render reuse of manim's partial movie segments.
+
+manim names the movie segment of every play() call by a hash of the camera,
+the animations and the mobjects on screen, and skips rendering any segment
+whose file already exists in the scene's partial_movie_dir. Renders use a
+private partial_movie_dir, so the segment cache keeps a shared directory of
+finished segments: each lookup of an unknown segment first links it in from
+the shared directory, and the segments of a finished render are published
+back. Identical intros, outros and loop steps are then encoded only once, and
+a repeated scene costs little more than the final concatenation.
+"""
+
+import os
+import re
+from typing import Any
+
+from cache import RenderCache, link_file
+from metrics import CACHE_REQUESTS
+
+# manim's play-call hashes: the camera, animations and mobjects hashes joined by "_".
+SEGMENT_PATTERN = re.compile(r"[0-9]+_[0-9]+_[0-9]+")
+
+
+class SegmentCache:
+    """A shared, size-bounded directory of partial movie segments named by manim's hashes."""
+
+    def __init__(self, directory: str, max_bytes: int, extension: str = "mp4") -> None:
+        """Initialize the cache, creating its directory if needed."""
+        self.store = RenderCache(directory, max_bytes, extension, key_pattern=SEGMENT_PATTERN)
+        self.extension = extension
+
+    def attach(self, file_writer: Any) -> None:
+        """
+        Make a scene's file writer find segments in the shared cache, linking
+        each reused segment into the writer's partial movie directory.
+        """
+        is_already_cached = file_writer.is_already_cached
+
+        def cached(hash_invocation: str) -> bool:
+            if is_already_cached(hash_invocation):
+                return True
+            shared = self.store.get(hash_invocation)
+            target = os.path.join(file_writer.partial_movie_directory,
+                                  f"{hash_invocation}.{self.extension}")
+            found = shared is not None and (link_file(shared, target) or os.path.exists(target))
+            CACHE_REQUESTS.inc(cache="segment", result="hit" if found else "miss")
+            return found
+
+        file_writer.is_already_cached = cached
+
+    def harvest(self, partial_movie_dir: str) -> int:
+        """Publish the segments rendered into a partial movie directory; returns how many."""
+        published = 0
+        suffix = f".{self.extension}"
+        try:
+            names = os.listdir(partial_movie_dir)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            key = name[:-len(suffix)]
+            if not name.endswith(suffix) or not SEGMENT_PATTERN.fullmatch(key):
+                continue
+            if link_file(os.path.join(partial_movie_dir, name), self.store.path_for(key)):
+                published += 1
+        if published:
+            self.store.evict()
+        return published
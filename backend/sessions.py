@@ -0,0 +1,85 @@
+"""Per-session memory of evaluated steps for incremental re-evaluation."""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from hashing import content_hash
+from parse import OperationNode
+
+# Number of editing sessions whose last evaluation is remembered.
+SESSION_LIMIT = int(os.environ.get('SESSION_LIMIT', 1000))
+
+
+class StepRecord:
+    """Class representing the evaluated state of one operation node."""
+
+    def __init__(self, node: OperationNode, video_id: Optional[str]) -> None:
+        """Record a computed node and the video rendered for it."""
+        self.operands = node.operands
+        self.kwargs = node.kwargs
+        self.result = node.result
+        self.video_id = video_id
+
+    def restore(self, node: OperationNode) -> None:
+        """Give a structurally identical node the recorded state instead of computing it."""
+        node.operands = self.operands
+        node.kwargs = self.kwargs
+        node.result = self.result
+
+
+class SessionStore:
+    """
+    Remembers the last operation DAG evaluated in each session.
+
+    Node keys hash a node's definition together with the keys of its inputs, so a
+    node whose key was seen in the previous evaluation is unchanged, and any edit
+    changes the keys of the edited node and all of its dependents. Evaluations
+    with different request options are remembered separately, as their videos
+    differ; options derived per step, such as a step's share of the render
+    budget, are not part of the session key.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_LIMIT) -> None:
+        """Initialize an empty store keeping at most max_sessions sessions."""
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict[str, StepRecord]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def previous(self, session_id: Optional[str],
+                 options: Optional[Dict[str, Any]] = None) -> Dict[str, StepRecord]:
+        """Return the records of the session's last evaluation, keyed by node key."""
+        if not session_id:
+            return {}
+        key = content_hash(session_id, options or {})
+        with self._lock:
+            records = self._sessions.get(key, {})
+            if key in self._sessions:
+                self._sessions.move_to_end(key)
+            return records
+
+    def remember(self, session_id: Optional[str], nodes: List[OperationNode],
+                 video_ids: List[Any], options: Optional[Dict[str, Any]] = None) -> None:
+        """Replace the session's records with the given evaluated nodes."""
+        if not session_id:
+            return
+        key = content_hash(session_id, options or {})
+        records = {node.key: StepRecord(node, video_id)
+                   for node, video_id in zip(nodes, video_ids)}
+        with self._lock:
+            self._sessions[key] = records
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def record_video(self, session_id: Optional[str], node_key: str, video_id: Optional[str],
+                     options: Optional[Dict[str, Any]] = None) -> None:
+        """Give a step of the session's last evaluation the video rendered for it later."""
+        if not session_id or not video_id:
+            return
+        key = content_hash(session_id, options or {})
+        with self._lock:
+            record = self._sessions.get(key, {}).get(node_key)
+            if record is not None and not record.video_id:
+                record.video_id = video_id
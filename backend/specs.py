@@ -0,0 +1,75 @@
+"""
+Render specifications of deferred steps, stored without pickle.
+
+A specification is a single .npz file: the arrays of the step (operands, keyword
+arguments and result) are stored as plain arrays, and everything else as a JSON
+document in the "spec" entry that refers to them by name. Loading it never runs
+code, even when the file comes from a directory other hosts can write to.
+"""
+
+import json
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+import numpy as np
+
+from parse import OperationNode
+
+SPEC_ENTRY = "spec"
+
+
+def _encode(value: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    """Convert a value to JSON, moving its arrays into arrays; keeps the types content_hash sees."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        array = np.asarray(value)
+        if array.dtype.hasobject:
+            raise TypeError("Arrays of Python objects cannot be stored in a render specification")
+        name = f"array{len(arrays)}"
+        arrays[name] = array
+        return {"array": name, "scalar": isinstance(value, np.generic)}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(item, arrays) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item, arrays) for item in value]
+    if isinstance(value, dict):
+        return {"dict": {str(key): _encode(item, arrays) for key, item in value.items()}}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"{type(value).__name__} cannot be stored in a render specification")
+
+
+def _decode(value: Any, arrays: Any) -> Any:
+    """Reverse _encode, taking the arrays from the loaded .npz file."""
+    if isinstance(value, list):
+        return [_decode(item, arrays) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "array" in value:
+        array = arrays[value["array"]]
+        return array[()] if value["scalar"] else array
+    if "tuple" in value:
+        return tuple(_decode(item, arrays) for item in value["tuple"])
+    return {key: _decode(item, arrays) for key, item in value["dict"].items()}
+
+
+def save_spec(f: BinaryIO, node: OperationNode, index: int,
+              options: Optional[Dict[str, Any]] = None) -> None:
+    """Write the computed state of a node, with its step index and render options, to f."""
+    arrays: Dict[str, np.ndarray] = {}
+    spec = {
+        "operation": node.operation,
+        "operands": _encode(node.operands, arrays),
+        "kwargs": _encode(node.kwargs, arrays),
+        "result": _encode(node.result, arrays),
+        "index": index,
+        "options": _encode(options or {}, arrays),
+    }
+    np.savez(f, **arrays, **{SPEC_ENTRY: np.array(json.dumps(spec))})
+
+
+def load_spec(path: str) -> Tuple[OperationNode, int, Dict[str, Any]]:
+    """Read a specification written by save_spec; returns the computed node, its index and options."""
+    with np.load(path, allow_pickle=False) as arrays:
+        spec = json.loads(str(arrays[SPEC_ENTRY]))
+        node = OperationNode(spec["operation"], _decode(spec["operands"], arrays),
+                             **_decode(spec["kwargs"], arrays))
+        node.result = _decode(spec["result"], arrays)
+        return node, spec["index"], _decode(spec["options"], arrays)
@@ -0,0 +1,161 @@
+"""
+Storage of rendered artifacts beyond a host's local caches, and the render lock.
+
+The local RenderCaches keep what one host serves. An ArtifactStore is where
+hosts find each other's outputs: after a local miss an artifact is fetched from
+the store into the local cache, and every new render is published to it. The
+store's lock, keyed by content hash, makes sure that only one process (on any
+host) renders a given artifact while the others wait and then fetch it.
+
+LocalStore shares nothing beyond the host; SharedDirectoryStore keeps artifacts
+and locks in a directory every host mounts (e.g. NFS), and works just as well
+on a local filesystem.
+"""
+
+import fcntl
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import ContextManager, Dict, Iterator
+
+from cache import RenderCache, link_file
+
+# Seconds to wait for another process's render before rendering anyway.
+RENDER_LOCK_TIMEOUT = int(os.environ.get('RENDER_LOCK_TIMEOUT', 600))
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = RENDER_LOCK_TIMEOUT) -> Iterator[bool]:
+    """
+    Hold an exclusive flock on the file at path for the duration of the with-block.
+    The lock is released by the kernel if its holder dies. Yields True if it was
+    acquired, or False if it was still held by someone else after timeout seconds.
+    The holder removes the file when it is done, so lock files do not pile up.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            if time.monotonic() >= deadline:
+                logger.warning("Timed out waiting for lock %s", path)
+                yield False
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            continue
+        if _is_current(fd, path):
+            break
+        # The previous holder removed the file after this process opened it
+        os.close(fd)
+    try:
+        yield True
+    finally:
+        # Removed while still locked, so a waiter never holds a lock on a removed file
+        os.unlink(path)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _is_current(fd: int, path: str) -> bool:
+    """Return whether fd is still the file at path, i.e. it was not removed meanwhile."""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(fd)
+    return (info.st_dev, info.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+class ArtifactStore(ABC):
+    """Base class of the stores where rendered artifacts are shared between hosts."""
+
+    @abstractmethod
+    def fetch(self, cache: RenderCache, key: str) -> bool:
+        """Copy the artifact for key into the local cache; returns False if absent."""
+
+    @abstractmethod
+    def publish(self, cache: RenderCache, key: str) -> None:
+        """Make the locally cached artifact for key available to other hosts."""
+
+    @abstractmethod
+    def lock(self, cache: RenderCache, key: str) -> ContextManager[bool]:
+        """Return a context manager held while producing the artifact for key."""
+
+
+class LocalStore(ArtifactStore):
+    """
+    A store that shares nothing beyond the local caches; its locks still keep
+    the processes of one host from rendering the same artifact twice.
+    """
+
+    def __init__(self, lock_dir: str) -> None:
+        """Initialize the store, keeping lock files in lock_dir."""
+        self.lock_dir = lock_dir
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def fetch(self, cache: RenderCache, key: str) -> bool:
+        """There is nothing beyond the local cache to fetch from."""
+        return False
+
+    def publish(self, cache: RenderCache, key: str) -> None:
+        """Artifacts stay in the local cache."""
+
+    def lock(self, cache: RenderCache, key: str) -> ContextManager[bool]:
+        """Lock the artifact for key against other processes on this host."""
+        name = os.path.basename(cache.path_for(key))
+        return file_lock(os.path.join(self.lock_dir, f"{name}.lock"))
+
+
+class SharedDirectoryStore(ArtifactStore):
+    """
+    A directory shared by all hosts holding every published artifact, bounded by
+    a disk quota like the local caches, with the render locks in a subdirectory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        """Initialize the store, creating its directories if needed."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock_dir = os.path.join(directory, "locks")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._views: Dict[str, RenderCache] = {}
+
+    def _shared(self, cache: RenderCache) -> RenderCache:
+        """Return a view of the shared directory for the artifacts of a local cache."""
+        # All views share one directory, so each eviction applies the quota to everything.
+        if cache.extension not in self._views:
+            self._views[cache.extension] = RenderCache(self.directory, self.max_bytes,
+                                                       cache.extension, cache.key_pattern)
+        return self._views[cache.extension]
+
+    def fetch(self, cache: RenderCache, key: str) -> bool:
+        """Link or copy the shared artifact for key into the local cache."""
+        source = self._shared(cache).get(key)
+        if source is None:
+            return False
+        staging = os.path.join(cache.directory, f".{uuid.uuid4().hex}.tmp")
+        if not link_file(source, staging):
+            return False
+        cache.put(key, staging)
+        return True
+
+    def publish(self, cache: RenderCache, key: str) -> None:
+        """Link or copy the locally cached artifact for key into the shared directory."""
+        shared = self._shared(cache)
+        staging = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        if link_file(cache.path_for(key), staging):
+            shared.put(key, staging)
+
+    def lock(self, cache: RenderCache, key: str) -> ContextManager[bool]:
+        """Lock the artifact for key against every process on every host."""
+        name = os.path.basename(cache.path_for(key))
+        return file_lock(os.path.join(self.lock_dir, f"{name}.lock"))
@@ -1,28 +1,41 @@
 """Manim code to visualize NumPy broadcast operations."""
 
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 import numpy as np
 from manim import *
 
-from templates.utils import adjust_brackets
+from templates.budget import BudgetedScene
+from templates.timeline import Timeline, show, transform
+from templates.utils import ElidedMatrix, adjust_brackets
 
 
-class BroadcastingAnimation(Scene):
+class BroadcastingAnimation(BudgetedScene):
     """A scene that visualizes broadcasting operations."""
 
     def __init__(self, arrays: List[np.ndarray],
                  target_shape: Optional[tuple] = None, *,
                  result: np.ndarray,
-                 wait_time: float = 0.5):
+                 wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.arrays = arrays if arrays is not None else []
         self.target_shape = target_shape
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+        if self.target_shape:
+            return 2 + 2 * self.wait_time, 0.0
+        if len(self.arrays) > 1:
+            return 1 + self.wait_time, 0.0
+        return 3 + 3 * self.wait_time, 0.0
 
     def construct(self):
         """Construct the scene for broadcasting operation visualization."""
-        matrices = [Matrix(arr) if arr.ndim != 1 else Matrix(
+        self.plan()
+        matrices = [ElidedMatrix(arr) if arr.ndim != 1 else ElidedMatrix(
             [[x] for x in arr]) for arr in self.arrays]
 
         for i, matrix in enumerate(matrices):
@@ -38,11 +51,12 @@ class BroadcastingAnimation(Scene):
         else:
             self.show_simple_broadcast(matrices[0])
 
-    def show_broadcast_to(self, matrix: Matrix, result: np.ndarray):
+    def show_broadcast_to(self, matrix: ElidedMatrix, result: np.ndarray):
         """Animate broadcasting to a target shape."""
-        new_elements = [MathTex(str(value)) for value in result.flatten()]
+        target = ElidedMatrix(result)
+        new_elements = [entry.copy() for entry in target.get_entries()]
         new_matrix = VGroup(*new_elements).arrange_in_grid(
-            rows=result.shape[0], cols=result.shape[1], buff=0.6
+            rows=len(target.row_indices), cols=len(target.col_indices), buff=0.6
         )
 
         left_bracket, right_bracket = adjust_brackets(matrix, new_matrix)
@@ -72,3 +86,24 @@ class BroadcastingAnimation(Scene):
         operation_text = Text("(in operations)").next_to(broadcast_text, DOWN)
         self.play(Write(operation_text))
         self.wait(self.wait_time)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        timeline = Timeline("broadcast_to", self.time_scale)
+        names = [timeline.matrix(f"input_{k}", arr if arr.ndim != 1 else [[x] for x in arr])
+                 for k, arr in enumerate(self.arrays)]
+
+        timeline.play(*[show(name) for name in names])
+        timeline.wait(self.wait_time)
+
+        if self.target_shape:
+            timeline.matrix("result", self.result)
+            timeline.play(transform(names[0], "result"))
+            timeline.wait(self.wait_time)
+        elif len(self.arrays) == 1:
+            timeline.play(show(timeline.text("broadcast", "broadcast")))
+            timeline.wait(self.wait_time)
+            timeline.play(show(timeline.text("operation", "(in operations)")))
+            timeline.wait(self.wait_time)
+        return timeline.to_dict()
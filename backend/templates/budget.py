@@ -0,0 +1,97 @@
+"""Render-time budgets shared by all scene templates."""
+
+from abc import ABCMeta, abstractmethod
+from typing import List, Optional, Tuple, TypeVar
+from manim import Scene, DEFAULT_WAIT_TIME
+from manim.animation.animation import prepare_animation
+
+FULL = "full"
+SAMPLED = "sampled"
+SUMMARY = "summary"
+
+# Animations are never sped up beyond this fraction of their natural duration.
+MIN_TIME_SCALE = 0.25
+
+T = TypeVar("T")
+
+
+class BudgetPlan:
+    """The level of detail and speed-up a scene uses to fit its budget."""
+
+    def __init__(self, level: str, time_scale: float, units: int) -> None:
+        """Initialize a plan walking through the given number of units."""
+        self.level = level
+        self.time_scale = time_scale
+        self.units = units
+
+
+def plan_budget(budget: Optional[float], fixed: float,
+                per_unit: float = 0.0, units: int = 0) -> BudgetPlan:
+    """
+    Plan a scene that takes `fixed` seconds plus `per_unit` seconds for each of `units`
+    walkthrough steps into at most `budget` seconds of video.
+
+    Animations are sped up first; if that is not enough, only a sample of the steps
+    is shown, and if not even one fits, only a summary without the walkthrough.
+    """
+    full = fixed + per_unit * units
+    if budget is None or full <= budget:
+        return BudgetPlan(FULL, 1.0, units)
+    if full * MIN_TIME_SCALE <= budget:
+        return BudgetPlan(FULL, budget / full, units)
+    if units and per_unit:
+        shown = int((budget / MIN_TIME_SCALE - fixed) // per_unit)
+        if shown >= 1:
+            return BudgetPlan(SAMPLED, budget / (fixed + per_unit * shown), shown)
+    return BudgetPlan(SUMMARY, max(MIN_TIME_SCALE, min(1.0, budget / fixed)), 0)
+
+
+def sample_evenly(items: List[T], count: int) -> List[T]:
+    """Return count items spread evenly over the list, keeping the first and last."""
+    if count >= len(items):
+        return items
+    if count <= 1:
+        return items[:count]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(k * step)] for k in range(count)]
+
+
+class BudgetedScene(Scene, metaclass=ABCMeta):
+    """
+    A scene whose animations and waits are uniformly sped up by `time_scale`.
+
+    Templates set `budget` (seconds of video, or None for no limit), define their
+    cost model in cost(), and call plan() at the start of both construct() and
+    timeline(), so the video and the timeline are planned alike.
+    """
+
+    budget: Optional[float] = None
+    time_scale: float = 1.0
+
+    @abstractmethod
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+
+    def plan(self, units: int = 0) -> BudgetPlan:
+        """Plan the scene's walkthrough of `units` steps with its cost model."""
+        fixed, per_unit = self.cost()
+        return self.apply_budget(fixed, per_unit, units)
+
+    def apply_budget(self, fixed: float, per_unit: float = 0.0, units: int = 0) -> BudgetPlan:
+        """Plan the scene within its budget and adopt the plan's speed-up."""
+        plan = plan_budget(self.budget, fixed, per_unit, units)
+        self.time_scale = plan.time_scale
+        return plan
+
+    def play(self, *args, **kwargs):
+        """Play animations, scaling their run time by the scene's time scale."""
+        if self.time_scale != 1.0 and args:
+            args = tuple(prepare_animation(animation) for animation in args)
+            run_time = kwargs.get("run_time") or max(
+                animation.run_time for animation in args)
+            kwargs["run_time"] = run_time * self.time_scale
+        return super().play(*args, **kwargs)
+
+    def wait(self, duration: float = DEFAULT_WAIT_TIME, *args, **kwargs):
+        """Wait for the duration scaled by the scene's time scale."""
+        return super().wait(duration * self.time_scale, *args, **kwargs)
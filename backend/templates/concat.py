@@ -1,57 +1,59 @@
 """Manim code to visualize NumPy concatenation operations."""
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 from manim import *
 
+from templates.budget import BudgetedScene
+from templates.timeline import Timeline, hide, show
+from templates.utils import ElidedMatrix
 
-class ConcatenationOperation(Scene):
+
+class ConcatenationOperation(BudgetedScene):
     """A scene that visualizes concatenation operations."""
 
     def __init__(self, array: np.ndarray, axis: Optional[int] = 0, *,
-                 result: np.ndarray, wait_time: float = 0.5):
+                 result: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.axis = axis
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+        return 3.5 + 3 * self.wait_time, 0.0
 
     def construct(self):
         """Construct the scene for concatenation operation visualization."""
+        self.plan()
         # Show original arrays
-        matrices = [Matrix(arr) for arr in self.array]
+        matrices = [ElidedMatrix(arr) for arr in self.array]
         group = VGroup(*matrices).arrange(RIGHT, buff=1)
         self.play(Write(group))
         self.wait(self.wait_time)
 
         # Create new matrix
-        new_matrix = Matrix(self.result)
+        new_matrix = ElidedMatrix(self.result)
         new_matrix.move_to(group.get_center())
 
-        # Prepare animations for all elements
+        # Prepare animations for all visible elements, mapping each one to its
+        # position in the result by offsetting along the concatenation axis
         element_animations = []
-        total_entries = 0
-
-        for idx, matrix in enumerate(matrices):
-            entries = matrix.get_entries()
-            if self.axis == 0:  # Concatenating along rows
-                for i, elem in enumerate(entries):
-                    target_index = total_entries + i
-                    if target_index < len(new_matrix.get_entries()):
-                        target_entry = new_matrix.get_entries()[target_index]
-                        element_animations.append(
-                            Transform(elem.copy(), target_entry))
-                total_entries += len(entries)
-            else:  # Concatenating along columns (axis == 1)
-                for i, row in enumerate(matrix.get_rows()):
-                    start_col = sum(len(m.get_columns())
-                                    for m in matrices[:idx])
-                    for j, elem in enumerate(row):
-                        target_row = new_matrix.get_rows()[i]
-                        if start_col + j < len(target_row):
-                            target_entry = target_row[start_col + j]
-                            element_animations.append(
-                                Transform(elem.copy(), target_entry))
+        offset = 0
+
+        for arr, matrix in zip(self.array, matrices):
+            for i in matrix.visible_rows():
+                for j in matrix.visible_cols():
+                    if self.axis == 0:  # Concatenating along rows
+                        target_entry = new_matrix.entry(offset + i, j)
+                    else:  # Concatenating along columns (axis == 1)
+                        target_entry = new_matrix.entry(i, offset + j)
+                    element_animations.append(
+                        Transform(matrix.entry(i, j).copy(), target_entry))
+            offset += np.shape(arr)[0 if self.axis == 0 else 1]
 
             # Fade out all original matrices' brackets
             element_animations.append(FadeOut(matrix))
@@ -73,3 +75,33 @@ class ConcatenationOperation(Scene):
             f"Final Shape: {self.result.shape}", font_size=24).to_edge(DOWN)
         self.play(Write(shape_text))
         self.wait(self.wait_time)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        timeline = Timeline("concatenate", self.time_scale)
+        names = [timeline.matrix(f"input_{k}", arr) for k, arr in enumerate(self.array)]
+        timeline.matrix("result", self.result)
+        timeline.text("shape", f"Final Shape: {self.result.shape}")
+
+        timeline.play(*[show(name) for name in names])
+        timeline.wait(self.wait_time)
+
+        # Visible entries move to their position in the result, offset along the axis
+        events = [show("result")]
+        offset = 0
+        for arr, name in zip(self.array, names):
+            if self.axis == 0:
+                events.append(timeline.move_visible(
+                    name, "result", lambda i, j, offset=offset: (offset + i, j)))
+            else:
+                events.append(timeline.move_visible(
+                    name, "result", lambda i, j, offset=offset: (i, offset + j)))
+            events.append(hide(name))
+            offset += np.shape(arr)[0 if self.axis == 0 else 1]
+        timeline.play(*events, run_time=1.5)
+
+        timeline.wait(self.wait_time)
+        timeline.play(show("shape"))
+        timeline.wait(self.wait_time)
+        return timeline.to_dict()
@@ -1,10 +1,22 @@
 # pylint: disable=no-member
 """Manim code to visualize elementwise operations"""
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import numpy as np
 from manim import *
 
+from templates.budget import BudgetedScene, sample_evenly
+from templates.timeline import Timeline, highlight, show, unhighlight, write
+from templates.utils import NUMBER_RENDERER, ElidedMatrix, number_mobject, tex_mobject
+
+GRANULARITIES = ("auto", "element", "row", "block", "array")
+
+# With "auto", results with at most this many visible cells are walked cell by
+# cell, up to ROW_LIMIT row by row, and anything larger in one step.
+ELEMENT_LIMIT = 9
+ROW_LIMIT = 36
+BLOCK_SIZE = 2
+
 OPS: Dict[str, Any] = {
     'add': (np.add, "+"),
     'sub': (np.subtract, "-"),
@@ -62,103 +74,179 @@ OPS: Dict[str, Any] = {
 }
 
 
-class ElementWiseOperation(Scene):
+class ElementWiseOperation(BudgetedScene):
     """A scene that visualizes elementwise operations with broadcasting support."""
 
     def __init__(self, array1: np.ndarray, array2: Optional[np.ndarray] = None,
                  operation: str = 'add', result: Optional[np.ndarray] = None,
-                 wait_time: float = 0.5):
+                 wait_time: float = 0.5, granularity: str = "auto",
+                 budget: Optional[float] = None):
         super().__init__()
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
         self.array1 = array1
         self.array2 = array2
         self.operation = operation
         self.result = np.atleast_2d(
             result if result is not None else OPS[operation][0](array1, array2))
         self.wait_time = wait_time
+        self.granularity = granularity
+        self.budget = budget
+
+    def cell_groups(self, rows: List[int], cols: List[int]) -> List[List[Tuple[int, int]]]:
+        """Group the visible result cells into the steps that are animated together."""
+        granularity = self.granularity
+        if granularity == "auto":
+            cells = len(rows) * len(cols)
+            granularity = ("element" if cells <= ELEMENT_LIMIT
+                           else "row" if cells <= ROW_LIMIT else "array")
+
+        if granularity == "element":
+            return [[(i, j)] for i in rows for j in cols]
+        elif granularity == "row":
+            return [[(i, j) for j in cols] for i in rows]
+        elif granularity == "block":
+            return [[(i, j) for i in rows[r:r + BLOCK_SIZE] for j in cols[c:c + BLOCK_SIZE]]
+                    for r in range(0, len(rows), BLOCK_SIZE)
+                    for c in range(0, len(cols), BLOCK_SIZE)]
+        return [[(i, j) for i in rows for j in cols]]
+
+    def operand_cells(self, group: List[Tuple[int, int]],
+                      array: np.ndarray) -> List[Tuple[int, int]]:
+        """Map result cells to the operand cells they are computed from, wrapping broadcast axes."""
+        return [(i % array.shape[0], j % array.shape[1]) for i, j in group]
+
+    def operation_tex(self, i: int, j: int) -> str:
+        """Return the worked equation for a single result cell as a LaTeX string."""
+        value1 = self.array1[i % self.array1.shape[0], j % self.array1.shape[1]]
+        if self.array2 is not None:
+            value2 = self.array2[i % self.array2.shape[0], j % self.array2.shape[1]]
+            return f"{value1} {OPS[self.operation][1]} {value2} = {self.result[i, j]}"
+        return f"{OPS[self.operation][1]} ({value1}) = {self.result[i, j]}"
+
+    def operation_text(self, i: int, j: int) -> Mobject:
+        """Create the worked equation for a single result cell."""
+        value1 = self.array1[i % self.array1.shape[0], j % self.array1.shape[1]]
+        if NUMBER_RENDERER == "text":
+            # Assemble the equation from cached pieces instead of compiling it as a whole
+            symbol = tex_mobject(OPS[self.operation][1])
+            if self.array2 is not None:
+                value2 = self.array2[i % self.array2.shape[0], j % self.array2.shape[1]]
+                parts = [number_mobject(value1), symbol, number_mobject(value2)]
+            else:
+                parts = [symbol, number_mobject(f"({value1})")]
+            parts += [tex_mobject("="), number_mobject(self.result[i, j])]
+            return VGroup(*parts).arrange(RIGHT, buff=0.2)
+        if self.array2 is not None:
+            value2 = self.array2[i % self.array2.shape[0], j % self.array2.shape[1]]
+            return MathTex(f"{value1}", OPS[self.operation][1], f"{value2}",
+                           "=", f"{self.result[i, j]}")
+        return MathTex(OPS[self.operation][1], f"({value1})", "=", f"{self.result[i, j]}")
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per group of cells."""
+        writes = 3 if self.array2 is not None else 2
+        return writes + 3 * self.wait_time, 4 * self.wait_time + 1
 
     def construct(self):
         """Construct the scene for elementwise operation visualization with broadcasting."""
-        m1 = Matrix(self.array1)
+        m1 = ElidedMatrix(self.array1)
         m1.shift(LEFT * 4)
 
         if self.array2 is not None:
-            m2 = Matrix(self.array2)
-            op_symbol = MathTex(OPS[self.operation][1]).next_to(m1, RIGHT)
+            m2 = ElidedMatrix(self.array2)
+            op_symbol = tex_mobject(OPS[self.operation][1]).next_to(m1, RIGHT)
             m2.next_to(op_symbol, RIGHT)
-            equals = MathTex("=").next_to(m2, RIGHT)
+            equals = tex_mobject("=").next_to(m2, RIGHT)
         else:
-            op_symbol = MathTex(OPS[self.operation][1]).next_to(m1, RIGHT)
-            equals = MathTex("=").next_to(op_symbol, RIGHT)
+            op_symbol = tex_mobject(OPS[self.operation][1]).next_to(m1, RIGHT)
+            equals = tex_mobject("=").next_to(op_symbol, RIGHT)
 
-        m_result = Matrix(self.result)
+        m_result = ElidedMatrix(self.result)
         m_result.next_to(equals, RIGHT)
 
+        groups = self.cell_groups(m_result.visible_rows(), m_result.visible_cols())
+        plan = self.plan(len(groups))
+
         self.play(Write(m1))
         if self.array2 is not None:
             self.play(Write(m2))
         self.play(Write(op_symbol), Write(equals), Write(m_result))
         self.wait(self.wait_time)
 
-        rect1 = None
-        rect2 = None
-
-        for i in range(self.result.shape[0]):
-            for j in range(self.result.shape[1]):
-                # Handle array1
-                if self.array1.shape[1] == 1:  # Column vector
-                    elem1 = m1.get_entries()[i % self.array1.shape[0]]
-                elif self.array1.shape[0] == 1:  # Row vector
-                    elem1 = m1.get_entries()[j % self.array1.shape[1]]
-                else:  # 2D array
-                    elem1 = m1.get_entries()[
-                        i * self.array1.shape[1] + (j % self.array1.shape[1])]
-                rect1 = SurroundingRectangle(elem1)
-
-                # Handle array2
-                if self.array2 is not None:
-                    if self.array2.shape[1] == 1:  # Column vector
-                        elem2 = m2.get_entries()[i % self.array2.shape[0]]
-                    elif self.array2.shape[0] == 1:  # Row vector
-                        elem2 = m2.get_entries()[j % self.array2.shape[1]]
-                    else:  # 2D array
-                        elem2 = m2.get_entries()[i * self.array2.shape[1] + j]
-                    rect2 = SurroundingRectangle(elem2)
-
-                self.play(Create(rect1), Create(
-                    rect2), run_time=self.wait_time)
-
-                # Create operation text
-                if self.array2 is not None:
-                    operation_text = MathTex(
-                        f"{self.array1[i % self.array1.shape[0], j % self.array1.shape[1]]}",
-                        OPS[self.operation][1],
-                        f"{self.array2[i % self.array2.shape[0], j % self.array2.shape[1]]}",
-                        "=",
-                        f"{self.result[i, j]}"
-                    )
-                else:
-                    operation_text = MathTex(
-                        OPS[self.operation][1],
-                        f"({self.array1[i % self.array1.shape[0], j % self.array1.shape[1]]})",
-                        "=",
-                        f"{self.result[i, j]}"
-                    )
-                operation_text.next_to(m_result, DOWN)
-
-                self.play(Write(operation_text), run_time=self.wait_time)
-                self.wait(self.wait_time)
-
-                result_elem = m_result.get_entries(
-                )[i * self.result.shape[1] + j]
-                self.play(ReplacementTransform(operation_text,
-                          result_elem), run_time=self.wait_time)
-
-                self.play(FadeOut(rect1), FadeOut(rect2))
-
-        # Clean up any remaining highlights
-        if rect1:
-            self.play(FadeOut(rect1))
-        if rect2:
-            self.play(FadeOut(rect2))
+        # Only the visible cells of the result are walked through, so large arrays
+        # cost no more than the elided matrix shows. Each group of cells is
+        # highlighted, computed and written into the result with one play call
+        # per stage. A tight budget walks through a sample of the groups only.
+        for group in sample_evenly(groups, plan.units):
+            # Broadcast row and column vectors by wrapping the index
+            rects = [SurroundingRectangle(m1.entry(i % self.array1.shape[0],
+                                                   j % self.array1.shape[1]))
+                     for i, j in group]
+            if self.array2 is not None:
+                rects += [SurroundingRectangle(m2.entry(i % self.array2.shape[0],
+                                                        j % self.array2.shape[1]))
+                          for i, j in group]
+            self.play(*[Create(rect) for rect in rects], run_time=self.wait_time)
+
+            if len(group) == 1:
+                texts = [self.operation_text(*group[0])]
+                texts[0].next_to(m_result, DOWN)
+            else:
+                texts = [number_mobject(self.result[i, j]) for i, j in group]
+                row = VGroup(*texts).arrange(RIGHT, buff=0.4).next_to(m_result, DOWN)
+                if row.width > config.frame_width - 1:
+                    row.scale_to_fit_width(config.frame_width - 1)
+
+            self.play(*[Write(text) for text in texts], run_time=self.wait_time)
+            self.wait(self.wait_time)
+
+            self.play(*[ReplacementTransform(text, m_result.entry(i, j))
+                        for text, (i, j) in zip(texts, group)], run_time=self.wait_time)
+
+            self.play(*[FadeOut(rect) for rect in rects])
 
         self.wait(2 * self.wait_time)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        timeline = Timeline(self.operation)
+        timeline.matrix("array1", self.array1)
+        timeline.label("operator", OPS[self.operation][1])
+        if self.array2 is not None:
+            timeline.matrix("array2", self.array2)
+        timeline.label("equals", "=")
+        timeline.matrix("result", self.result)
+
+        groups = self.cell_groups(timeline.visible_rows("result"),
+                                  timeline.visible_cols("result"))
+        plan = self.plan(len(groups))
+        timeline.time_scale = self.time_scale
+
+        timeline.play(show("array1"))
+        if self.array2 is not None:
+            timeline.play(show("array2"))
+        timeline.play(show("operator"), show("equals"), show("result"))
+        timeline.wait(self.wait_time)
+
+        for k, group in enumerate(sample_evenly(groups, plan.units)):
+            highlights = [highlight("array1", timeline.cells(
+                "array1", self.operand_cells(group, self.array1)))]
+            if self.array2 is not None:
+                highlights.append(highlight("array2", timeline.cells(
+                    "array2", self.operand_cells(group, self.array2))))
+            timeline.play(*highlights, run_time=self.wait_time)
+
+            values = [str(self.result[i, j]) for i, j in group]
+            label = timeline.label(f"step_{k}", self.operation_tex(*group[0])
+                                   if len(group) == 1 else r"\quad ".join(values))
+            timeline.play(show(label), run_time=self.wait_time)
+            timeline.wait(self.wait_time)
+
+            timeline.play(write("result", timeline.cells("result", group), label, values),
+                          run_time=self.wait_time)
+            timeline.play(*[unhighlight(event["target"], event["cells"])
+                            for event in highlights])
+
+        timeline.wait(2 * self.wait_time)
+        return timeline.to_dict()
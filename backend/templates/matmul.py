@@ -1,17 +1,35 @@
 """Manim code to visualize matrix multiplication."""
 
+from typing import Any, Dict, Optional, Tuple
 from manim import *
 
+from templates.budget import BudgetedScene, sample_evenly
+from templates.timeline import Timeline, highlight, show, unhighlight, write
+from templates.utils import ElidedMatrix, number_mobject
 
-class MatrixMultiplication(Scene):
+
+class MatrixMultiplication(BudgetedScene):
     """A scene that visualizes matrix multiplication."""
 
     def __init__(self, matrix1: np.ndarray,
-                 matrix2: np.ndarray, wait_time: float = 0.5):
+                 matrix2: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array1 = matrix1
         self.array2 = matrix2
         self.wait_time = wait_time
+        self.budget = budget
+
+    def cell_value(self, i: int, j: int) -> float:
+        """Compute entry (i, j) of the product."""
+        value = sum(self.array1[i][k] * self.array2[k][j]
+                    for k in range(len(self.array2)))
+        return round(value, 2)
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per cell."""
+        # Fixed: showing the matrices, and filling in the cells a sampled walkthrough skips
+        return 4 * self.wait_time, 5 * self.wait_time
 
     def construct(self):
         """Construct the scene for matrix multiplication visualization."""
@@ -20,10 +38,10 @@ class MatrixMultiplication(Scene):
             self.array2), "Matrices cannot be multiplied. Inner dimensions must match."
 
         # Create matrix mobjects
-        m1 = Matrix(self.array1)
-        m2 = Matrix(self.array2)
-        result = Matrix([[0 for _ in range(len(self.array2[0]))]
-                        for _ in range(len(self.array1))])
+        m1 = ElidedMatrix(self.array1)
+        m2 = ElidedMatrix(self.array2)
+        result = ElidedMatrix([[0 for _ in range(len(self.array2[0]))]
+                               for _ in range(len(self.array1))])
 
         # Position matrices and operation symbols
         m1.shift(LEFT * 4)
@@ -32,6 +50,10 @@ class MatrixMultiplication(Scene):
         equals = Tex("=").next_to(m2, RIGHT)
         result.next_to(equals, RIGHT)
 
+        cells = [(i, j) for i in result.visible_rows() for j in result.visible_cols()]
+        plan = self.plan(len(cells))
+        walked = sample_evenly(cells, plan.units)
+
         # Add everything to the scene
         self.play(
             Write(m1),
@@ -44,33 +66,83 @@ class MatrixMultiplication(Scene):
         self.wait(self.wait_time)
 
         # Animate the multiplication process
-        for i in range(len(self.array1)):
-            for j in range(len(self.array2[0])):
-                # Highlight row and column
-                row_rect = SurroundingRectangle(m1.get_rows()[i])
-                col_rect = SurroundingRectangle(m2.get_columns()[j])
-                self.play(Create(row_rect), Create(
-                    col_rect), run_time=self.wait_time)
-
-                # Calculate the result
-                value = sum(self.array1[i][k] * self.array2[k][j]
-                            for k in range(len(self.array2)))
-                value = round(value, 2)
-
-                # Create a temporary element to show the calculation
-                temp_element = MathTex(str(value)).next_to(result, DOWN)
-                self.play(Write(temp_element), run_time=self.wait_time)
-
-                # Move the temporary element to its position in the result matrix
-                target_position = result.get_entries(
-                )[i*len(self.array2[0]) + j].get_center()
-                self.play(temp_element.animate.move_to(
-                    target_position), run_time=self.wait_time)
-
-                # Update the result matrix
-                result.get_entries()[i*len(self.array2[0]) +
-                                     j].become(temp_element)
-
-                self.wait(self.wait_time)
-                self.play(FadeOut(row_rect), FadeOut(
-                    col_rect), run_time=self.wait_time)
+        for i, j in walked:
+            # Highlight row and column
+            row_rect = SurroundingRectangle(m1.row(i))
+            col_rect = SurroundingRectangle(m2.column(j))
+            self.play(Create(row_rect), Create(
+                col_rect), run_time=self.wait_time)
+
+            # Create a temporary element to show the calculation
+            temp_element = number_mobject(self.cell_value(i, j)).next_to(result, DOWN)
+            self.play(Write(temp_element), run_time=self.wait_time)
+
+            # Move the temporary element to its position in the result matrix
+            target_position = result.entry(i, j).get_center()
+            self.play(temp_element.animate.move_to(
+                target_position), run_time=self.wait_time)
+
+            # Update the result matrix
+            result.entry(i, j).become(temp_element)
+
+            self.wait(self.wait_time)
+            self.play(FadeOut(row_rect), FadeOut(
+                col_rect), run_time=self.wait_time)
+
+        # Fill in the cells that were not walked through all at once
+        skipped = [cell for cell in cells if cell not in walked]
+        if skipped:
+            texts = [number_mobject(self.cell_value(i, j)) for i, j in skipped]
+            row = VGroup(*texts).arrange(RIGHT, buff=0.4).next_to(result, DOWN)
+            if row.width > config.frame_width - 1:
+                row.scale_to_fit_width(config.frame_width - 1)
+            self.play(*[Write(text) for text in texts], run_time=self.wait_time)
+            self.play(*[ReplacementTransform(text, result.entry(i, j))
+                        for text, (i, j) in zip(texts, skipped)], run_time=self.wait_time)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        assert len(self.array1[0]) == len(
+            self.array2), "Matrices cannot be multiplied. Inner dimensions must match."
+
+        timeline = Timeline("matmul")
+        timeline.matrix("array1", self.array1)
+        timeline.label("operator", r"\times")
+        timeline.matrix("array2", self.array2)
+        timeline.label("equals", "=")
+        timeline.matrix("result", np.zeros((len(self.array1), len(self.array2[0])), dtype=int))
+
+        cells = [(i, j) for i in timeline.visible_rows("result")
+                 for j in timeline.visible_cols("result")]
+        plan = self.plan(len(cells))
+        timeline.time_scale = self.time_scale
+        walked = sample_evenly(cells, plan.units)
+
+        timeline.play(show("array1"), show("operator"), show("array2"), show("equals"),
+                      show("result"), run_time=self.wait_time)
+        timeline.wait(self.wait_time)
+
+        inner = range(len(self.array2))
+        for i, j in walked:
+            row = timeline.cells("array1", [(i, k) for k in inner])
+            column = timeline.cells("array2", [(k, j) for k in inner])
+            timeline.play(highlight("array1", row), highlight("array2", column),
+                          run_time=self.wait_time)
+
+            value = str(self.cell_value(i, j))
+            label = timeline.label(f"cell_{i}_{j}", value)
+            timeline.play(show(label), run_time=self.wait_time)
+            timeline.play(write("result", [[i, j]], label, [value]), run_time=self.wait_time)
+
+            timeline.wait(self.wait_time)
+            timeline.play(unhighlight("array1", row), unhighlight("array2", column),
+                          run_time=self.wait_time)
+
+        skipped = [cell for cell in cells if cell not in walked]
+        if skipped:
+            values = [str(self.cell_value(i, j)) for i, j in skipped]
+            label = timeline.label("skipped", r"\quad ".join(values))
+            timeline.play(show(label), run_time=self.wait_time)
+            timeline.play(write("result", [[i, j] for i, j in skipped], label, values),
+                          run_time=self.wait_time)
+        return timeline.to_dict()
@@ -1,19 +1,22 @@
 """Manim code to visualize NumPy reduction operations."""
 
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 import numpy as np
 from manim import *
 
-from templates.utils import adjust_brackets
+from templates.budget import BudgetedScene
+from templates.timeline import Timeline, highlight, show, transform
+from templates.utils import ElidedMatrix, adjust_brackets, number_mobject
 
 
-class ReductionOperation(Scene):
+class ReductionOperation(BudgetedScene):
     """A scene that visualizes reduction operations."""
 
     def __init__(self, array: np.ndarray, axis: Optional[int] = None,
                  weights: Optional[np.ndarray] = None, *,
                  result: np.ndarray, operation: str = 'sum',
-                 wait_time: float = 0.5):
+                 wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.operation = operation
@@ -21,10 +24,16 @@ class ReductionOperation(Scene):
         self.weights = weights
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+        return 7 * self.wait_time, 0.0
 
     def construct(self):
         """Construct the scene for reduction operation visualization."""
-        m = Matrix(self.array)
+        self.plan()
+        m = ElidedMatrix(self.array)
         m.shift(ORIGIN)
 
         # Add matrix and operation label to the scene
@@ -35,7 +44,7 @@ class ReductionOperation(Scene):
             rect = SurroundingRectangle(m)
             self.play(Create(rect), run_time=self.wait_time)
 
-            result_text = MathTex(str(self.result))
+            result_text = number_mobject(self.result)
             result_text.move_to(m)
 
             self.play(
@@ -52,14 +61,15 @@ class ReductionOperation(Scene):
 
         self.wait(self.wait_time * 2)
 
-    def row_reduction(self, matrix: Matrix, result: np.ndarray, wait_time: float):
+    def row_reduction(self, matrix: ElidedMatrix, result: np.ndarray, wait_time: float):
         """Animate row-wise reduction."""
         rows = matrix.get_rows()
         rects = VGroup(*[SurroundingRectangle(row) for row in rows])
         self.play(Create(rects), run_time=wait_time)
 
         result_texts = VGroup(
-            *[MathTex(str(val)).move_to(row[0]) for val, row in zip(result, rows)])
+            *[number_mobject(result[i] if i is not None else r"\vdots").move_to(row[0])
+              for i, row in zip(matrix.row_indices, rows)])
 
         left_bracket, right_bracket = adjust_brackets(
             matrix, result_texts)
@@ -73,14 +83,15 @@ class ReductionOperation(Scene):
             run_time=wait_time*2
         )
 
-    def column_reduction(self, matrix: Matrix, result: np.ndarray, wait_time: float):
+    def column_reduction(self, matrix: ElidedMatrix, result: np.ndarray, wait_time: float):
         """Animate column-wise reduction."""
         columns = matrix.get_columns()
         rects = VGroup(*[SurroundingRectangle(column) for column in columns])
         self.play(Create(rects), run_time=wait_time)
 
         result_texts = VGroup(
-            *[MathTex(str(val)).move_to(column[0]) for val, column in zip(result, columns)])
+            *[number_mobject(result[j] if j is not None else r"\cdots").move_to(column[0])
+              for j, column in zip(matrix.col_indices, columns)])
 
         left_bracket, right_bracket = adjust_brackets(
             matrix, result_texts)
@@ -93,3 +104,30 @@ class ReductionOperation(Scene):
             FadeOut(rects),
             run_time=wait_time*2
         )
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        timeline = Timeline(self.operation, self.time_scale)
+        timeline.matrix("input", self.array)
+        rows, cols = timeline.visible_rows("input"), timeline.visible_cols("input")
+
+        # One highlight for the whole array, or one per reduced column or row
+        if self.axis is None:
+            timeline.label("result", str(self.result))
+            groups = [[(i, j) for i in rows for j in cols]]
+        elif self.axis == 0:
+            timeline.matrix("result", np.atleast_2d(self.result))
+            groups = [[(i, j) for i in rows] for j in cols]
+        else:
+            timeline.matrix("result", np.atleast_2d(self.result).T)
+            groups = [[(i, j) for j in cols] for i in rows]
+
+        timeline.play(show("input"), run_time=self.wait_time)
+        timeline.wait(self.wait_time)
+        timeline.play(*[highlight("input", timeline.cells("input", group)) for group in groups],
+                      run_time=self.wait_time)
+        timeline.play(transform("input", "result"), run_time=self.wait_time * 2)
+
+        timeline.wait(self.wait_time * 2)
+        return timeline.to_dict()
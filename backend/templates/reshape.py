@@ -1,31 +1,46 @@
 """Manim code to visualize NumPy reshape operations."""
 
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 import numpy as np
 from manim import *
 
-from templates.utils import adjust_brackets
+from templates.budget import BudgetedScene
+from templates.timeline import morph_timeline
+from templates.utils import ElidedMatrix, adjust_brackets, number_mobject, visible_indices
 
 
-class ReshapeOperation(Scene):
+class MorphOperation(BudgetedScene):
+    """Base class of the scenes that morph a matrix into its reshaped result."""
+
+    wait_time: float = 0.5
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+        return 2 + 2 * self.wait_time, 0.0
+
+
+class ReshapeOperation(MorphOperation):
     """A scene that visualizes reshape operations."""
 
     def __init__(self, array: np.ndarray, new_shape: Optional[Tuple[int, ...]] = None, *,
-                 result: np.ndarray, wait_time: float = 0.5):
+                 result: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.new_shape = new_shape
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
 
     def construct(self):
         """Construct the scene for reshape operation visualization."""
-        initial_matrix = Matrix(self.array)
+        self.plan()
+        initial_matrix = ElidedMatrix(self.array)
         initial_matrix.move_to(ORIGIN)
         self.play(Write(initial_matrix))
         self.wait(self.wait_time)
 
-        final_matrix = Matrix(self.result)
+        final_matrix = ElidedMatrix(self.result)
         final_matrix.move_to(ORIGIN)
 
         self.play(
@@ -36,24 +51,33 @@ class ReshapeOperation(Scene):
         )
         self.wait(self.wait_time)
 
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        return morph_timeline("reshape", self.array, self.result, self.wait_time,
+                              self.time_scale)
+
 
-class RavelOperation(Scene):
+class RavelOperation(MorphOperation):
     """A scene that visualizes ravel operations."""
 
-    def __init__(self, array: np.ndarray, result: np.ndarray, wait_time: float = 0.5):
+    def __init__(self, array: np.ndarray, result: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
 
     def construct(self):
         """Construct the scene for ravel operation visualization."""
-        initial_matrix = Matrix(self.array)
+        self.plan()
+        initial_matrix = ElidedMatrix(self.array)
         initial_matrix.move_to(ORIGIN)
         self.play(Write(initial_matrix))
         self.wait(self.wait_time)
 
-        final_matrix = Matrix([self.result])
+        final_matrix = ElidedMatrix([self.result])
         final_matrix.move_to(ORIGIN)
 
         self.play(
@@ -64,24 +88,33 @@ class RavelOperation(Scene):
         )
         self.wait(self.wait_time)
 
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        return morph_timeline("ravel", self.array, [self.result], self.wait_time,
+                              self.time_scale)
 
-class FlattenOperation(Scene):
+
+class FlattenOperation(MorphOperation):
     """A scene that visualizes flatten operations."""
 
-    def __init__(self, array: np.ndarray, result: np.ndarray, wait_time: float = 0.5):
+    def __init__(self, array: np.ndarray, result: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
 
     def construct(self):
         """Construct the scene for flatten operation visualization."""
-        initial_matrix = Matrix(self.array)
+        self.plan()
+        initial_matrix = ElidedMatrix(self.array)
         initial_matrix.move_to(ORIGIN)
         self.play(Write(initial_matrix))
         self.wait(self.wait_time)
 
-        final_matrix = Matrix([self.result])
+        final_matrix = ElidedMatrix([self.result])
         final_matrix.move_to(ORIGIN)
 
         self.play(
@@ -92,26 +125,35 @@ class FlattenOperation(Scene):
         )
         self.wait(self.wait_time)
 
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        return morph_timeline("flatten", self.array, [self.result], self.wait_time,
+                              self.time_scale)
+
 
-class SqueezeOperation(Scene):
+class SqueezeOperation(MorphOperation):
     """A scene that visualizes squeeze operations."""
 
     def __init__(self, array: np.ndarray, axis: Optional[int] = 0, *,
-                 result: np.ndarray, wait_time: float = 0.5):
+                 result: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.axis = axis
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
 
     def construct(self):
         """Construct the scene for squeeze operation visualization."""
-        initial_matrix = Matrix(self.array)
+        self.plan()
+        initial_matrix = ElidedMatrix(self.array)
         initial_matrix.move_to(ORIGIN)
         self.play(Write(initial_matrix))
         self.wait(self.wait_time)
 
-        final_matrix = Matrix([self.result])
+        final_matrix = ElidedMatrix([self.result])
         final_matrix.move_to(ORIGIN)
 
         self.play(
@@ -122,32 +164,44 @@ class SqueezeOperation(Scene):
         )
         self.wait(self.wait_time)
 
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        return morph_timeline("squeeze", self.array, [self.result], self.wait_time,
+                              self.time_scale)
+
 
-class ExpandDimsOperation(Scene):
+class ExpandDimsOperation(MorphOperation):
     """A scene that visualizes expand_dims operations."""
 
     def __init__(self, array: np.ndarray, axis: Optional[int] = 0, *,
-                 result: np.ndarray, wait_time: float = 0.5):
+                 result: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.axis = axis
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
 
     def construct(self):
         """Construct the scene for expand_dims operation visualization."""
-        initial_matrix = Matrix(self.array)
+        self.plan()
+        initial_matrix = ElidedMatrix(self.array)
         initial_matrix.move_to(ORIGIN)
         self.play(Write(initial_matrix))
         self.wait(self.wait_time)
 
-        sub_matrices = [Matrix(subarray) for subarray in np.apply_along_axis(
-            lambda x: x, self.axis, self.result)]
+        subarrays = np.apply_along_axis(lambda x: x, self.axis, self.result)
+        sub_matrices = [ElidedMatrix(subarrays[k]) if k is not None else number_mobject(r"\cdots")
+                        for k in visible_indices(len(subarrays))]
 
         if self.axis == 0:
             rows, cols = len(sub_matrices), 1
         elif self.axis == len(self.array.shape) or self.axis == -1:
             rows, cols = 1, len(sub_matrices)
+        elif len(sub_matrices) < len(subarrays):
+            rows, cols = 1, len(sub_matrices)
         else:
             rows, cols = self.result.shape[self.axis], self.result.shape[self.axis+1]
 
@@ -161,3 +215,9 @@ class ExpandDimsOperation(Scene):
 
         self.play(ReplacementTransform(initial_matrix, final_matrix))
         self.wait(self.wait_time)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        return morph_timeline("expand_dims", self.array, self.result, self.wait_time,
+                              self.time_scale)
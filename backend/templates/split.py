@@ -1,40 +1,45 @@
 """Manim code to visualize NumPy split operations."""
 
-from typing import Optional, Union, List
+from typing import Any, Dict, Optional, Union, List, Tuple
 import numpy as np
 from manim import *
 
+from templates.budget import BudgetedScene
+from templates.timeline import Timeline, divide, hide, show
+from templates.utils import ElidedMatrix
 
-class SplitOperation(Scene):
+
+class SplitOperation(BudgetedScene):
     """A scene that visualizes split operations."""
 
     def __init__(self, array: np.ndarray, indices_or_sections=None,
                  axis: Optional[int] = 0, *,
-                 result: List[np.ndarray], wait_time: float = 0.5):
+                 result: List[np.ndarray], wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.axis = axis
         self.indices_or_sections = indices_or_sections
         self.result = result
         self.wait_time = wait_time
+        self.budget = budget
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+        return 4.5 + 4 * self.wait_time, 0.0
 
     def construct(self):
         """Construct the scene for split operation visualization."""
-        original_matrix = Matrix(self.array)
+        self.plan()
+        original_matrix = ElidedMatrix(self.array)
         original_matrix.to_edge(ORIGIN)
         self.play(Write(original_matrix))
         self.wait(self.wait_time)
 
-        split_matrices = [Matrix(arr) for arr in self.result]
+        split_matrices = [ElidedMatrix(arr) for arr in self.result]
         split_group = VGroup(*split_matrices).arrange(RIGHT, buff=1)
 
-        if isinstance(self.indices_or_sections, int):
-            split_size = self.array.shape[self.axis] // self.indices_or_sections
-            split_indices = [split_size *
-                             i for i in range(1, self.indices_or_sections)]
-        else:
-            split_indices = self.indices_or_sections
-
+        split_indices = self.split_indices()
         highlights = self.create_highlights(original_matrix, split_indices)
 
         if highlights:
@@ -59,14 +64,21 @@ class SplitOperation(Scene):
         self.play(Write(shape_text))
         self.wait(self.wait_time)
 
-    def create_highlights(self, matrix: Matrix, split_indices: List[int]) -> List[Line]:
+    def split_indices(self) -> List[int]:
+        """Return the indices along the axis at which the array is split."""
+        if isinstance(self.indices_or_sections, int):
+            split_size = self.array.shape[self.axis] // self.indices_or_sections
+            return [split_size * i for i in range(1, self.indices_or_sections)]
+        return self.indices_or_sections
+
+    def create_highlights(self, matrix: ElidedMatrix, split_indices: List[int]) -> List[Line]:
         """Create highlight lines for split locations."""
         highlights = []
         for idx in split_indices:
             if self.axis == 1:  # Highlighting between columns
-                if idx < len(matrix.get_columns()):
-                    left_col = matrix.get_columns()[idx - 1].get_right()
-                    right_col = matrix.get_columns()[idx].get_left()
+                if idx < self.array.shape[1]:
+                    left_col = matrix.column(idx - 1).get_right()
+                    right_col = matrix.column(idx).get_left()
                     mid_point = (left_col + right_col) / 2
                     highlight = Line(
                         start=mid_point + matrix.get_top() - matrix.get_center(),
@@ -75,9 +87,9 @@ class SplitOperation(Scene):
                     )
                     highlights.append(highlight)
             else:  # Highlighting between rows
-                if idx < len(matrix.get_rows()):
-                    top_row = matrix.get_rows()[idx - 1].get_bottom()
-                    bottom_row = matrix.get_rows()[idx].get_top()
+                if idx < self.array.shape[0]:
+                    top_row = matrix.row(idx - 1).get_bottom()
+                    bottom_row = matrix.row(idx).get_top()
                     mid_point = (top_row + bottom_row) / 2
                     highlight = Line(
                         start=mid_point + matrix.get_left() - matrix.get_center(),
@@ -87,25 +99,57 @@ class SplitOperation(Scene):
                     highlights.append(highlight)
         return highlights
 
-    def create_split_animations(self, original_matrix: Matrix, split_group: VGroup,
+    def create_split_animations(self, original_matrix: ElidedMatrix, split_group: VGroup,
                                 split_indices: List[int]) -> List[Transform]:
         """Create animations for the split operation."""
         animations = []
         for i, split_matrix in enumerate(split_group):
             start = split_indices[i-1] if i > 0 else 0
-            end = split_indices[i] if i < len(
-                split_indices) else self.array.shape[self.axis]
-
-            if self.axis == 0:
-                source_entries = original_matrix.get_entries(
-                )[start*self.array.shape[1]:end*self.array.shape[1]]
-            else:
-                source_entries = [row[start:end]
-                                  for row in original_matrix.get_rows()]
-                source_entries = [
-                    item for sublist in source_entries for item in sublist]  # Flatten
 
-            for source, target in zip(source_entries, split_matrix.get_entries()):
-                animations.append(Transform(source.copy(), target))
+            for row in split_matrix.visible_rows():
+                for col in split_matrix.visible_cols():
+                    if self.axis == 0:
+                        source = original_matrix.entry(start + row, col)
+                    else:
+                        source = original_matrix.entry(row, start + col)
+                    animations.append(
+                        Transform(source.copy(), split_matrix.entry(row, col)))
 
         return animations
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        timeline = Timeline("split", self.time_scale)
+        timeline.matrix("input", self.array)
+        names = [timeline.matrix(f"result_{k}", arr) for k, arr in enumerate(self.result)]
+        timeline.text("shape", f"Shapes: {[arr.shape for arr in self.result]}")
+
+        timeline.play(show("input"))
+        timeline.wait(self.wait_time)
+
+        axis = 1 if self.axis == 1 else 0
+        split_indices = self.split_indices()
+        dividers = [divide("input", axis, idx) for idx in split_indices
+                    if idx < self.array.shape[axis]]
+        if dividers:
+            timeline.play(*dividers)
+            timeline.wait(self.wait_time)
+
+        events = [hide("input")]
+        bounds = [0] + list(split_indices) + [self.array.shape[axis]]
+        for k, name in enumerate(names):
+            start, end = bounds[k], bounds[k + 1]
+            if axis == 0:
+                mapping = lambda i, j, start=start, end=end: (
+                    (i - start, j) if start <= i < end else None)
+            else:
+                mapping = lambda i, j, start=start, end=end: (
+                    (i, j - start) if start <= j < end else None)
+            events += [show(name), timeline.move_visible("input", name, mapping)]
+        timeline.play(*events, run_time=1.5)
+
+        timeline.wait(self.wait_time)
+        timeline.play(show("shape"))
+        timeline.wait(self.wait_time)
+        return timeline.to_dict()
@@ -0,0 +1,187 @@
+"""
+JSON animation timelines, an alternative to rendering scenes with manim.
+
+A timeline lists the objects of a scene (matrices and labels) and the events
+that animate them, each with a start time and duration in seconds:
+
+    show / hide         target
+    highlight / unhighlight   target, cells
+    move                target, cells -> into, into_cells (values fly over)
+    write               target, cells, from (a label that moves into the cells)
+    transform           target -> into (entries morph in row-major order)
+    divide              target, axis, index (a split line before the index)
+
+Cells are [row, column] indices into the full array. Matrices larger than
+MAX_VISIBLE along an axis only carry their visible rows and columns, with
+null marking the elided middle, so a step costs a few KB however large its
+arrays are.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from templates.utils import TEXT_SYMBOLS, visible_indices
+
+TIMELINE_VERSION = 1
+
+Cell = Tuple[int, int]
+
+
+def _display_value(array: np.ndarray, i: Optional[int], j: Optional[int]) -> str:
+    """Return the text shown for a cell of an elided matrix."""
+    if i is None and j is None:
+        return TEXT_SYMBOLS[r"\ddots"]
+    elif i is None:
+        return TEXT_SYMBOLS[r"\vdots"]
+    elif j is None:
+        return TEXT_SYMBOLS[r"\cdots"]
+    return str(array[i, j])
+
+
+class Timeline:
+    """Builds the JSON timeline of a scene, mirroring the manim scene's choreography."""
+
+    def __init__(self, operation: str, time_scale: float = 1.0) -> None:
+        """Initialize an empty timeline; durations are scaled by time_scale."""
+        self.operation = operation
+        self.time_scale = time_scale
+        self.time = 0.0
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.events: List[Dict[str, Any]] = []
+        self._visible: Dict[str, Tuple[List[Optional[int]], List[Optional[int]]]] = {}
+
+    def matrix(self, name: str, array: Any) -> str:
+        """Add a (possibly elided) matrix object and return its name."""
+        array = np.array(array)
+        shape = list(array.shape)
+        if array.ndim < 2:
+            array = np.atleast_2d(array)
+        rows = visible_indices(array.shape[0])
+        cols = visible_indices(array.shape[1])
+        self._visible[name] = (rows, cols)
+        self.objects[name] = {
+            "kind": "matrix",
+            "shape": shape,
+            "rows": rows,
+            "cols": cols,
+            "values": [[_display_value(array, i, j) for j in cols] for i in rows],
+        }
+        return name
+
+    def label(self, name: str, tex: str) -> str:
+        """Add a label object holding a LaTeX string and return its name."""
+        self.objects[name] = {"kind": "tex", "tex": tex}
+        return name
+
+    def text(self, name: str, text: str) -> str:
+        """Add a plain text object and return its name."""
+        self.objects[name] = {"kind": "text", "text": text}
+        return name
+
+    def visible_rows(self, name: str) -> List[int]:
+        """Return the indices of the rows of a matrix that are shown."""
+        return [i for i in self._visible[name][0] if i is not None]
+
+    def visible_cols(self, name: str) -> List[int]:
+        """Return the indices of the columns of a matrix that are shown."""
+        return [j for j in self._visible[name][1] if j is not None]
+
+    def cells(self, name: str, cells: Iterable[Cell]) -> List[List[int]]:
+        """Return the given cells of a matrix that are shown, as JSON pairs."""
+        rows, cols = self._visible[name]
+        return [[int(i), int(j)] for i, j in cells if i in rows and j in cols]
+
+    def move_visible(self, source: str, into: str,
+                     mapping: Callable[[int, int], Optional[Cell]]) -> Dict[str, Any]:
+        """
+        Return a move event taking every shown cell of source to the cell of into
+        given by mapping, skipping cells mapped to None or to an elided cell.
+        """
+        rows, cols = self._visible[into]
+        pairs = [((i, j), mapping(i, j)) for i in self.visible_rows(source)
+                 for j in self.visible_cols(source)]
+        pairs = [(cell, target) for cell, target in pairs
+                 if target is not None and target[0] in rows and target[1] in cols]
+        return move(source, [[i, j] for (i, j), _ in pairs],
+                    into, [[int(i), int(j)] for _, (i, j) in pairs])
+
+    def play(self, *events: Dict[str, Any], run_time: float = 1.0) -> None:
+        """Add events that start together and advance the clock by their duration."""
+        duration = run_time * self.time_scale
+        for event in events:
+            self.events.append({"t": round(self.time, 3), "duration": round(duration, 3),
+                                **event})
+        self.time += duration
+
+    def wait(self, duration: float = 1.0) -> None:
+        """Advance the clock without any events."""
+        self.time += duration * self.time_scale
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON-serializable timeline."""
+        return {
+            "version": TIMELINE_VERSION,
+            "operation": self.operation,
+            "duration": round(self.time, 3),
+            "objects": self.objects,
+            "events": self.events,
+        }
+
+
+def show(target: str) -> Dict[str, Any]:
+    """Fade or write an object in."""
+    return {"action": "show", "target": target}
+
+
+def hide(target: str) -> Dict[str, Any]:
+    """Fade an object out."""
+    return {"action": "hide", "target": target}
+
+
+def highlight(target: str, cells: List[List[int]]) -> Dict[str, Any]:
+    """Surround cells of a matrix with a highlight."""
+    return {"action": "highlight", "target": target, "cells": cells}
+
+
+def unhighlight(target: str, cells: List[List[int]]) -> Dict[str, Any]:
+    """Remove the highlight from cells of a matrix."""
+    return {"action": "unhighlight", "target": target, "cells": cells}
+
+
+def move(target: str, cells: List[List[int]], into: str,
+         into_cells: List[List[int]]) -> Dict[str, Any]:
+    """Move copies of cell values from one matrix into cells of another (or the same) one."""
+    return {"action": "move", "target": target, "cells": cells,
+            "into": into, "into_cells": into_cells}
+
+
+def write(target: str, cells: List[List[int]], source: str,
+          values: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Move a label into cells of a matrix, setting them to the given values."""
+    event = {"action": "write", "target": target, "cells": cells, "from": source}
+    if values is not None:
+        event["values"] = values
+    return event
+
+
+def transform(target: str, into: str) -> Dict[str, Any]:
+    """Morph one object into another."""
+    return {"action": "transform", "target": target, "into": into}
+
+
+def divide(target: str, axis: int, index: int) -> Dict[str, Any]:
+    """Draw a split line in a matrix before the given row (axis 0) or column (axis 1)."""
+    return {"action": "divide", "target": target, "axis": axis, "index": index}
+
+
+def morph_timeline(operation: str, array: Any, result: Any, wait_time: float,
+                   time_scale: float = 1.0) -> Dict[str, Any]:
+    """Build the timeline of a scene that writes an array and morphs it into the result."""
+    timeline = Timeline(operation, time_scale)
+    timeline.matrix("input", array)
+    timeline.matrix("result", result)
+    timeline.play(show("input"))
+    timeline.wait(wait_time)
+    timeline.play(transform("input", "result"))
+    timeline.wait(wait_time)
+    return timeline.to_dict()
@@ -1,19 +1,31 @@
 """Manim code to visualize matrix transposition."""
 
+from typing import Any, Dict, Optional, Tuple
 import numpy as np
 from manim import *
 
+from templates.budget import BudgetedScene
+from templates.timeline import Timeline, hide, show, transform
+from templates.utils import ElidedMatrix
 
-class MatrixTransposition(Scene):
+
+class MatrixTransposition(BudgetedScene):
     """A scene that visualizes matrix transposition."""
 
-    def __init__(self, array: np.ndarray, wait_time: float = 0.5):
+    def __init__(self, array: np.ndarray, wait_time: float = 0.5,
+                 budget: Optional[float] = None):
         super().__init__()
         self.array = array
         self.wait_time = wait_time
+        self.budget = budget
+
+    def cost(self) -> Tuple[float, float]:
+        """Return the seconds of video the scene takes unhurried: fixed, and per unit."""
+        return 2.5 + 3 * self.wait_time, 0.0
 
     def construct(self):
         """Construct the scene for matrix transposition visualization."""
+        self.plan()
         matrix = np.array(self.array)
 
         if matrix.ndim == 1 or (matrix.ndim == 2 and 1 in matrix.shape):
@@ -25,13 +37,14 @@ class MatrixTransposition(Scene):
         """Animate the transposition of a vector."""
         is_row = vector.ndim == 2 and vector.shape[0] == 1
 
-        m = Matrix([vector[0]] if is_row else [[x] for x in vector])
+        row_vector = np.reshape(vector, (1, -1))
+        m = ElidedMatrix(row_vector if is_row else row_vector.T)
         m.move_to(ORIGIN)
 
         self.play(Write(m))
         self.wait(self.wait_time)
 
-        transposed = Matrix([[x] for x in vector[0]] if is_row else [vector])
+        transposed = ElidedMatrix(row_vector.T if is_row else row_vector)
         transposed.move_to(ORIGIN)
 
         self.play(
@@ -44,17 +57,20 @@ class MatrixTransposition(Scene):
 
     def matrix_transposition(self, matrix: np.ndarray):
         """Animate the transposition of a matrix."""
-        m = Matrix(matrix)
+        m = ElidedMatrix(matrix)
         m.move_to(ORIGIN)
 
         self.play(Write(m))
         self.wait(self.wait_time)
 
         animations = []
-        for i in range(matrix.shape[0]):
-            for j in range(i+1, matrix.shape[1]):  # Only upper triangle
-                elem1 = m.get_entries()[i*matrix.shape[1] + j]
-                elem2 = m.get_entries()[j*matrix.shape[0] + i]
+        for i in m.visible_rows():
+            for j in m.visible_cols():
+                # Only the upper triangle, swapping with visible mirror entries
+                if j <= i or not m.is_visible(j, i):
+                    continue
+                elem1 = m.entry(i, j)
+                elem2 = m.entry(j, i)
                 animations.extend([
                     elem1.animate.move_to(elem2.get_center()),
                     elem2.animate.move_to(elem1.get_center())
@@ -62,3 +78,23 @@ class MatrixTransposition(Scene):
 
         self.play(*animations, run_time=1.5)
         self.wait(2 * self.wait_time)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Describe the scene as a JSON timeline for the client to animate."""
+        self.plan()
+        matrix = np.array(self.array)
+        timeline = Timeline("transpose", self.time_scale)
+        timeline.matrix("input", matrix)
+        timeline.matrix("result", np.atleast_2d(matrix).T)
+
+        timeline.play(show("input"))
+        timeline.wait(self.wait_time)
+
+        if matrix.ndim == 1 or (matrix.ndim == 2 and 1 in matrix.shape):
+            timeline.play(transform("input", "result"), run_time=1.5)
+        else:
+            timeline.play(show("result"), hide("input"),
+                          timeline.move_visible("input", "result", lambda i, j: (j, i)),
+                          run_time=1.5)
+        timeline.wait(2 * self.wait_time)
+        return timeline.to_dict()
@@ -1,7 +1,41 @@
 """Utility functions for Manim visualizations."""
 
-from typing import Tuple
-from manim import VGroup, LEFT, RIGHT
+import os
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from manim import MathTex, Matrix, Mobject, Text, VGroup, LEFT, RIGHT
+
+# Arrays with more rows or columns than this are drawn with their middle elided.
+MAX_VISIBLE = int(os.environ.get("MATRIX_MAX_VISIBLE", 6))
+
+# Part of every render key: bump it when a change to the templates changes their
+# videos, so that the videos cached under the old keys are no longer served.
+TEMPLATE_VERSION = 1
+
+# "tex" typesets numbers with LaTeX; "text" draws them with Pango and skips LaTeX.
+NUMBER_RENDERER = os.environ.get("NUMBER_RENDERER", "tex")
+
+# Plain-text stand-ins for the tex symbols drawn like numbers.
+TEXT_SYMBOLS = {r"\vdots": "⋮", r"\cdots": "⋯", r"\ddots": "⋱"}
+
+
+@lru_cache(maxsize=4096)
+def _glyph_prototype(text: str, renderer: str) -> Mobject:
+    """Build the mobject for a string once; callers receive copies."""
+    if renderer == "text":
+        return Text(TEXT_SYMBOLS.get(text, text))
+    return MathTex(text)
+
+
+def tex_mobject(tex: str) -> Mobject:
+    """Return a copy of a memoized MathTex, so each string is only compiled and parsed once."""
+    return _glyph_prototype(tex, "tex").copy()
+
+
+def number_mobject(value: Any) -> Mobject:
+    """Return a mobject showing a number (or ellipsis) with the configured renderer."""
+    return _glyph_prototype(str(value), NUMBER_RENDERER).copy()
 
 
 def adjust_brackets(matrix: VGroup, new_matrix: VGroup) -> Tuple[VGroup, VGroup]:
@@ -24,3 +58,97 @@ def adjust_brackets(matrix: VGroup, new_matrix: VGroup) -> Tuple[VGroup, VGroup]
     left_bracket.next_to(new_matrix, LEFT)
     right_bracket.next_to(new_matrix, RIGHT)
     return left_bracket, right_bracket
+
+
+def visible_indices(length: int, limit: int = MAX_VISIBLE) -> List[Optional[int]]:
+    """
+    Return the indices shown along an axis of the given length.
+
+    Axes longer than the limit keep their first and last indices, with None
+    marking the position of the ellipsis, for a total of limit slots.
+    """
+    if length <= limit:
+        return list(range(length))
+    head = limit // 2
+    tail = max(limit - head - 1, 1)
+    return list(range(head)) + [None] + list(range(length - tail, length))
+
+
+class ElidedMatrix(Matrix):
+    """
+    A matrix mobject that summarizes large arrays.
+
+    Arrays that fit within the limits are drawn exactly like Matrix(array). Larger
+    arrays only show their corner blocks, separated by ellipsis rows and columns,
+    so the number of entries (and the cost of animating them) stays bounded.
+    Entries are looked up by their index in the original array; hidden indices
+    resolve to the ellipsis that stands in for them.
+    """
+
+    def __init__(self, array: Any, max_rows: int = MAX_VISIBLE,
+                 max_cols: int = MAX_VISIBLE, **kwargs: Any):
+        array = np.array(array)
+        if array.ndim < 2:
+            array = np.atleast_2d(array)
+        kwargs.setdefault("element_to_mobject", number_mobject)
+        self.array_shape = array.shape
+        self.row_indices = visible_indices(array.shape[0], max_rows)
+        self.col_indices = visible_indices(array.shape[1], max_cols)
+
+        if None in self.row_indices or None in self.col_indices:
+            super().__init__([[self._display_value(array, i, j) for j in self.col_indices]
+                              for i in self.row_indices], **kwargs)
+        else:
+            super().__init__(array, **kwargs)
+
+    @staticmethod
+    def _display_value(array: np.ndarray, i: Optional[int], j: Optional[int]) -> str:
+        """Return the tex string shown at a display position."""
+        if i is None and j is None:
+            return r"\ddots"
+        elif i is None:
+            return r"\vdots"
+        elif j is None:
+            return r"\cdots"
+        return str(array[i, j])
+
+    @staticmethod
+    def _display_position(indices: List[Optional[int]], length: int, index: int) -> int:
+        """Map an original index along an axis to the display position that shows it."""
+        if index < 0:
+            index += length
+        if index in indices:
+            return indices.index(index)
+        return indices.index(None)
+
+    def visible_rows(self) -> List[int]:
+        """Return the original indices of the rows that are shown."""
+        return [i for i in self.row_indices if i is not None]
+
+    def visible_cols(self) -> List[int]:
+        """Return the original indices of the columns that are shown."""
+        return [j for j in self.col_indices if j is not None]
+
+    def is_visible(self, i: int, j: int) -> bool:
+        """Return whether the entry at (i, j) of the original array is shown."""
+        return i in self.row_indices and j in self.col_indices
+
+    def entry(self, i: int, j: int) -> Mobject:
+        """Return the mobject showing entry (i, j) of the original array."""
+        row = self._display_position(self.row_indices, self.array_shape[0], i)
+        col = self._display_position(self.col_indices, self.array_shape[1], j)
+        return self.get_entries()[row * len(self.col_indices) + col]
+
+    def flat_entry(self, index: int) -> Mobject:
+        """Return the mobject showing the entry at a flat (row-major) index."""
+        return self.entry(*divmod(index, self.array_shape[1]))
+
+    def row(self, i: int) -> VGroup:
+        """Return the displayed row that shows row i of the original array."""
+        row = self._display_position(self.row_indices, self.array_shape[0], i)
+        return self.get_rows()[row]
+
+    def column(self, j: int) -> VGroup:
+        """Return the displayed column that shows column j of the original array."""
+        col = self._display_position(self.col_indices, self.array_shape[1], j)
+        return self.get_columns()[col]
@@ -0,0 +1,7 @@
+"""Makes the backend modules importable from the tests."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GLYPH_WARMUP', '0')
@@ -0,0 +1,56 @@
+"""Tests of the /visualize endpoint."""
+
+import pytest
+
+pytest.importorskip("manim")
+
+import app  # noqa: E402  pylint: disable=wrong-import-position
+import jobs  # noqa: E402  pylint: disable=wrong-import-position
+
+CODE = "import numpy as np\na = np.array([[1, 2], [3, 4]])\nb = np.sum(a)\n"
+
+
+def test_async_session_reuses_finished_videos(monkeypatch):
+    """A second async request with unchanged steps gets their videos instead of new jobs."""
+    rendered = []
+
+    def fake_render_step(node, index, options=None, workers=1):
+        rendered.append(node.key)
+        return f"video-{index}"
+
+    monkeypatch.setattr(jobs, "render_step", fake_render_step)
+    client = app.app.test_client()
+    body = {"code": CODE, "async": True, "session_id": "test-async-session"}
+
+    first = client.post("/visualize", json=body).get_json()
+    step = next(result for result in first if "job_id" in result)
+    app.RENDER_JOBS.get(step["job_id"]).future.result(timeout=10)
+
+    second = client.post("/visualize", json=body).get_json()
+    assert len(rendered) == 1
+    assert all("job_id" not in result for result in second)
+    assert any(result.get("video_url") == "/video/video-0" for result in second)
+    assert not any(result["changed"] for result in second)
+
+
+def test_adding_a_step_keeps_the_session_with_a_budget(monkeypatch):
+    """With a render budget, adding a step renders only that step, not the unchanged ones."""
+    rendered = []
+
+    def fake_render_step(node, index, options=None, workers=1):
+        rendered.append((node.operation, options["budget"]))
+        return f"video-{node.operation}"
+
+    monkeypatch.setattr(jobs, "render_step", fake_render_step)
+    client = app.app.test_client()
+    body = {"code": CODE, "async": True, "session_id": "test-budget-session", "budget": 12}
+
+    for result in client.post("/visualize", json=body).get_json():
+        if "job_id" in result:
+            app.RENDER_JOBS.get(result["job_id"]).future.result(timeout=10)
+    body["code"] = CODE + "c = np.transpose(a)\n"
+    for result in client.post("/visualize", json=body).get_json():
+        if "job_id" in result:
+            app.RENDER_JOBS.get(result["job_id"]).future.result(timeout=10)
+
+    assert rendered == [("sum", 12.0), ("transpose", 6.0)]
@@ -0,0 +1,63 @@
+"""Tests of the scene templates' render budgets."""
+
+import pytest
+
+pytest.importorskip("manim")
+
+from parse import parse  # noqa: E402  pylint: disable=wrong-import-position
+from render import scene_template  # noqa: E402  pylint: disable=wrong-import-position
+from templates.budget import MIN_TIME_SCALE, BudgetedScene  # noqa: E402  pylint: disable=wrong-import-position
+
+CODE = """import numpy as np
+a = np.array([[1, 2, 3], [4, 5, 6]])
+b = np.array([[1, 0, 2], [0, 1, 3]])
+v = np.array([1, 2, 3])
+c = np.add(a, b)
+d = np.sqrt(a)
+e = np.matmul(a, np.transpose(b))
+f = np.sum(a, axis=0)
+g = np.reshape(a, (3, 2))
+h = np.concatenate((a, b), axis=0)
+i = np.split(a, 3, axis=1)
+j = np.broadcast_to(v, (2, 3))
+k = np.expand_dims(v, 0)
+"""
+
+
+def _scenes(budget=None):
+    """Yield every step of CODE with the scene that animates it."""
+    options = {"budget": budget} if budget is not None else {}
+    for node in parse(CODE):
+        node.compute()
+        scene_class, kwargs = scene_template(node, options)
+        yield node.operation, scene_class(*node.operands, **kwargs, **node.kwargs)
+
+
+@pytest.mark.parametrize("budget", [2.0, 5.0, 10.0, 60.0])
+def test_planned_timelines_fit_the_budget(budget):
+    """plan() keeps every scene within its budget, unless a summary is already at full speed-up."""
+    for operation, scene in _scenes(budget):
+        duration = scene.timeline()["duration"]
+        fixed, _ = scene.cost()
+        assert duration <= max(budget, fixed * MIN_TIME_SCALE) + 0.01, operation
+
+
+def test_cost_models_match_unhurried_timelines():
+    """Without a budget, the scenes take as long as their cost models say."""
+    for operation, scene in _scenes():
+        duration = scene.timeline()["duration"]
+        fixed, per_unit = scene.cost()
+        if operation in ("add", "sqrt"):
+            # The 2x3 result is walked through cell by cell
+            assert duration == pytest.approx(fixed + 6 * per_unit), operation
+        elif operation == "matmul":
+            # The budget keeps time to fill in skipped cells, which none are here
+            assert duration <= fixed + 4 * per_unit
+        else:
+            assert duration == pytest.approx(fixed), operation
+
+
+def test_scenes_must_define_their_cost():
+    """BudgetedScene is abstract: a template without a cost model cannot be created."""
+    with pytest.raises(TypeError):
+        BudgetedScene()  # pylint: disable=abstract-class-instantiated
@@ -0,0 +1,61 @@
+"""Tests of the content-addressed render cache."""
+
+import os
+import time
+
+import pytest
+
+from cache import RenderCache
+
+KEYS = [f"{digit}" * 64 for digit in "0123"]
+
+
+def _put(cache, tmp_path, key, size=100):
+    source = tmp_path / f"{key}.src"
+    source.write_bytes(b"x" * size)
+    return cache.put(key, str(source))
+
+
+def _age(path, seconds):
+    """Make an entry look last used the given number of seconds ago."""
+    when = time.time() - seconds
+    os.utime(path, (when, when))
+
+
+def test_evicts_least_recently_used_beyond_the_quota(tmp_path):
+    """Entries beyond the quota are evicted oldest first, and a hit makes an entry recent."""
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=300)
+    for age, key in zip((30, 20, 10), KEYS):
+        _age(_put(cache, tmp_path, key), age)
+    assert cache.get(KEYS[0]) is not None
+
+    _put(cache, tmp_path, KEYS[3])
+    assert cache.get(KEYS[1]) is None
+    assert all(cache.get(key) is not None for key in (KEYS[0], KEYS[2], KEYS[3]))
+    assert sum(entry.stat().st_size for entry in os.scandir(cache.directory)) <= 300
+
+
+def test_keeps_the_entry_just_added(tmp_path):
+    """An entry larger than the whole quota is still served once."""
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=50)
+    path = _put(cache, tmp_path, KEYS[0])
+    assert cache.get(KEYS[0]) == path
+
+
+@pytest.mark.parametrize("key", ["../" + "0" * 61, "0" * 63, "0" * 64 + ".mp4", "G" * 64, ""])
+def test_rejects_malformed_keys(tmp_path, key):
+    """Only keys matching the pattern name files: others miss and cannot be stored."""
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1000)
+    assert cache.get(key) is None
+    with pytest.raises(ValueError):
+        cache.path_for(key)
+
+
+def test_content_digest_follows_the_file(tmp_path):
+    """The ETag digest is recomputed when an entry is replaced."""
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1000)
+    _put(cache, tmp_path, KEYS[0], size=10)
+    first = cache.content_digest(KEYS[0])
+    assert cache.content_digest(KEYS[0]) == first
+    _put(cache, tmp_path, KEYS[0], size=20)
+    assert cache.content_digest(KEYS[0]) != first
@@ -0,0 +1,58 @@
+"""Tests of the benchmark regression check."""
+
+import json
+
+from benchmarks.compare import compare, compare_files
+
+
+def _result(case, total, stages=None, rss=100.0, video=50_000):
+    return {"case": case, "stages": stages or {"render": total}, "total": total,
+            "peak_rss_mb": rss, "video_bytes": video}
+
+
+def _write(path, results):
+    path.write_text(json.dumps({"results": results}))
+    return str(path)
+
+
+def test_growth_beyond_the_threshold_regresses():
+    """A metric more than threshold slower, and beyond the noise margin, regresses."""
+    rows = compare({"results": [_result("matmul", 1.0)]},
+                   {"results": [_result("matmul", 1.5)]}, threshold=0.2)
+    regressed = {row["metric"] for row in rows if row["regressed"]}
+    assert regressed == {"total", "stages.render"}
+
+
+def test_growth_within_the_threshold_or_the_noise_margin_passes():
+    """Small relative growth, and large relative growth of tiny values, pass."""
+    rows = compare({"results": [_result("matmul", 1.0, {"parse": 0.001}, video=1000)]},
+                   {"results": [_result("matmul", 1.1, {"parse": 0.003}, video=1500)]},
+                   threshold=0.2)
+    assert rows and not any(row["regressed"] for row in rows)
+
+
+def test_files_exit_with_failure_on_regression(tmp_path, capsys):
+    """compare_files reports regressions and returns 1."""
+    baseline = _write(tmp_path / "baseline.json", [_result("sum", 1.0)])
+    current = _write(tmp_path / "current.json", [_result("sum", 2.0)])
+    assert compare_files(baseline, current, 0.2) == 1
+    assert "REGRESSION sum" in capsys.readouterr().out
+
+
+def test_files_pass_without_regression(tmp_path):
+    """compare_files returns 0 when every case is within the threshold."""
+    baseline = _write(tmp_path / "baseline.json", [_result("sum", 1.0)])
+    current = _write(tmp_path / "current.json", [_result("sum", 0.9)])
+    assert compare_files(baseline, current, 0.2) == 0
+
+
+def test_missing_or_failed_cases_fail(tmp_path, capsys):
+    """A baseline case missing from the current run, or failing in it, fails the comparison."""
+    baseline = _write(tmp_path / "baseline.json",
+                      [_result("sum", 1.0), _result("split", 1.0), _result("concat", 1.0)])
+    current = _write(tmp_path / "current.json",
+                     [_result("sum", 1.0), {"case": "split", "error": "boom"}])
+    assert compare_files(baseline, current, 0.2) == 1
+    output = capsys.readouterr().out
+    assert "MISSING    concat" in output
+    assert "MISSING    split" in output
@@ -0,0 +1,93 @@
+"""Tests of the Prometheus instrumentation."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, Metric, Registry
+
+REGISTRY = Registry()
+RENDERS = REGISTRY.register(Counter("renders_total", "Renders.", ["template"]))
+SECONDS = REGISTRY.register(Histogram("render_seconds", "Render time.", ["template"],
+                                      buckets=(1, 5)))
+
+
+def test_counter_exposition_escapes_label_values():
+    """Label values are quoted with backslashes, quotes and newlines escaped."""
+    counter = Counter("requests_total", "Requests.", ["path"])
+    counter.inc(path='a"b\\c\nd')
+    counter.inc(2, path="/")
+    assert counter.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{path="/"} 2',
+        'requests_total{path="a\\"b\\\\c\\nd"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    """Each bucket counts the observations up to its bound, and +Inf counts them all."""
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.5, 1, 2.5))
+    for value in (0.1, 0.7, 0.9, 3):
+        histogram.observe(value)
+    assert histogram.samples() == [
+        'latency_seconds_bucket{le="0.5"} 1',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="2.5"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 4.7",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_labels_must_match_the_declaration():
+    """Recording with missing or unknown labels fails."""
+    counter = Counter("requests_total", "Requests.", ["path"])
+    with pytest.raises(ValueError):
+        counter.inc(method="GET")
+
+
+def test_gauge_reads_its_callback():
+    """A gauge with a function reports its value when scraped."""
+    assert Gauge("queue_depth", "Depth.", lambda: 3).samples() == ["queue_depth 3"]
+
+
+def test_metric_is_abstract():
+    """A metric must define its samples."""
+    with pytest.raises(TypeError):
+        Metric("x", "X.")  # pylint: disable=abstract-class-instantiated
+
+
+def _start_worker():
+    """Drop the metrics a forked worker inherits, as render.init_worker does."""
+    REGISTRY.drain()
+
+
+def _render_in_worker(template):
+    """Record a render in a worker process and return its drained metrics."""
+    RENDERS.inc(template=template)
+    SECONDS.observe(2, template=template)
+    return REGISTRY.drain()
+
+
+def test_worker_metrics_are_merged_into_the_web_process():
+    """Metrics drained in worker processes add up in the process that merges them."""
+    RENDERS.inc(template="matmul")
+    with ProcessPoolExecutor(max_workers=2, initializer=_start_worker) as workers:
+        for drained in workers.map(_render_in_worker, ["matmul", "matmul", "transpose"]):
+            REGISTRY.merge(drained)
+
+    assert RENDERS.value(template="matmul") == 3
+    assert RENDERS.value(template="transpose") == 1
+    assert 'render_seconds_bucket{template="matmul",le="5"} 2' in SECONDS.samples()
+    assert 'render_seconds_count{template="transpose"} 1' in SECONDS.samples()
+
+
+def test_drain_resets_the_values():
+    """Values are sent once: a second drain returns nothing new."""
+    registry = Registry()
+    counter = registry.register(Counter("drained_total", "Drained."))
+    counter.inc()
+    assert registry.drain() == {"drained_total": {(): 1.0}}
+    assert registry.drain() == {}
+    assert counter.value() == 0
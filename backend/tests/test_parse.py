@@ -0,0 +1,72 @@
+"""Tests of the operation DAG built by the parser."""
+
+import numpy as np
+
+from parse import ArrayNode, OperationNode, parse, topological_order
+
+CODE = """import numpy as np
+a = np.array([[1, 2], [3, 4]])
+b = np.array([[5, 6], [7, 8]])
+c = np.add(a, b)
+d = np.sum(c)
+"""
+
+
+def test_keys_are_stable_across_parses():
+    """Parsing the same code twice gives the same keys, in the same order."""
+    first = [node.key for node in parse(CODE)]
+    second = [node.key for node in parse(CODE)]
+    assert first == second
+    assert len(set(first)) == len(first)
+
+
+def test_keys_depend_on_operands_and_arguments():
+    """Changing an operand or a keyword argument changes the key of the step."""
+    base = parse(CODE)[0].key
+    changed_operand = parse(CODE.replace("[7, 8]", "[7, 9]"))[0].key
+    changed_kwargs = parse(CODE.replace("np.add(a, b)", "np.add(a, b, dtype=float)"))[0].key
+    assert len({base, changed_operand, changed_kwargs}) == 3
+
+
+def test_common_subexpressions_are_computed_once():
+    """Repeated identical expressions become one node shared by their consumers."""
+    code = CODE + "e = np.add(a, b)\nf = np.multiply(np.add(a, b), e)\n"
+    nodes = parse(code)
+    assert [node.operation for node in nodes] == ["add", "sum", "multiply"]
+    add, _, multiply = nodes
+    assert multiply.operands == [add, add]
+
+
+def test_identical_array_literals_are_interned():
+    """Equal array literals under different names are one input node."""
+    code = "import numpy as np\na = np.array([1, 2])\nb = np.array([1, 2])\nc = np.add(a, b)\n"
+    (add,) = parse(code)
+    assert isinstance(add.operands[0], ArrayNode)
+    assert add.operands[0] is add.operands[1]
+
+
+def test_steps_follow_their_inputs():
+    """Every step comes after the steps it uses, whatever the source order."""
+    nodes = parse(CODE + "e = np.transpose(np.multiply(c, d))\n")
+    position = {id(node): i for i, node in enumerate(nodes)}
+    for node in nodes:
+        for dependency in node.inputs:
+            if not isinstance(dependency, ArrayNode):
+                assert position[id(dependency)] < position[id(node)]
+
+
+def test_topological_order_skips_array_literals_and_duplicates():
+    """Array literals are traversed but not returned; shared nodes appear once."""
+    array = ArrayNode("a", np.array([1, 2]))
+    double = OperationNode("add", [array, array])
+    square = OperationNode("multiply", [double, double])
+    assert topological_order([square, double]) == [double, square]
+
+
+def test_computed_nodes_match_numpy():
+    """Computing the steps in order gives NumPy's results."""
+    nodes = parse(CODE)
+    for node in nodes:
+        node.compute()
+    assert np.array_equal(nodes[0].result, [[6, 8], [10, 12]])
+    assert nodes[1].result == 36
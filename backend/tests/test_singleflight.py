@@ -0,0 +1,78 @@
+"""Tests of the coalescing of concurrent identical calls."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+FOLLOWERS = 4
+
+
+def _run_concurrently(flight, fn):
+    """Call flight.do("key", fn) from a leader and FOLLOWERS more threads while fn is held."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def held():
+        started.set()
+        assert release.wait(5)
+        return fn()
+
+    def call():
+        try:
+            return flight.do("key", held)
+        except Exception as e:  # pylint: disable=broad-except
+            return e
+
+    with ThreadPoolExecutor(max_workers=FOLLOWERS + 1) as threads:
+        leader = threads.submit(call)
+        assert started.wait(5)
+        followers = [threads.submit(call) for _ in range(FOLLOWERS)]
+        # Let the followers reach the call in flight before the leader finishes
+        time.sleep(0.1)
+        assert flight.in_flight() == 1
+        release.set()
+        return [leader.result(5)] + [follower.result(5) for follower in followers]
+
+
+def test_concurrent_calls_run_once_and_share_the_result():
+    """Callers of a key in flight wait for it and get the leader's result."""
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return object()
+
+    results = _run_concurrently(flight, fn)
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_concurrent_calls_share_the_exception():
+    """An exception of the leader is raised to every waiting caller."""
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise RuntimeError("render failed")
+
+    errors = _run_concurrently(flight, fn)
+    assert len(calls) == 1
+    assert all(error is errors[0] for error in errors)
+    assert isinstance(errors[0], RuntimeError)
+
+
+def test_calls_after_completion_run_again():
+    """Only concurrent calls are shared: the next call runs the function again."""
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: int("x"))
+    assert flight.in_flight() == 0
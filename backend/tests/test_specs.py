@@ -0,0 +1,49 @@
+"""Tests of the deferred render specifications."""
+
+import numpy as np
+import pytest
+
+from hashing import content_hash
+from parse import OperationNode
+from specs import load_spec, save_spec
+
+
+def _state(node):
+    return content_hash(node.operation, node.operands, node.kwargs, node.result)
+
+
+def test_spec_round_trip_keeps_the_hashed_state(tmp_path):
+    """A loaded specification hashes like the node it was saved from."""
+    matrix = np.array([[1.5, 2.0], [3.0, 4.0]])
+    node = OperationNode("transpose", [matrix], axes=(1, 0))
+    node.result = matrix.T
+    path = tmp_path / "spec.npz"
+    with open(path, "wb") as f:
+        save_spec(f, node, 3, {"budget": 2.5, "format": "webm"})
+
+    loaded, index, options = load_spec(str(path))
+    assert _state(loaded) == _state(node)
+    assert loaded.kwargs == {"axes": (1, 0)}
+    assert index == 3
+    assert options == {"budget": 2.5, "format": "webm"}
+
+
+def test_numpy_scalars_stay_numpy_scalars(tmp_path):
+    """A NumPy scalar result is not turned into a Python number, which would hash differently."""
+    node = OperationNode("sum", [np.array([[1, 2], [3, 4]])])
+    node.compute()
+    path = tmp_path / "spec.npz"
+    with open(path, "wb") as f:
+        save_spec(f, node, 0)
+
+    loaded, _, _ = load_spec(str(path))
+    assert isinstance(loaded.result, np.generic)
+    assert _state(loaded) == _state(node)
+
+
+def test_object_arrays_are_refused(tmp_path):
+    """Arrays that could only be stored pickled are refused."""
+    node = OperationNode("sum", [np.array([object()], dtype=object)])
+    with open(tmp_path / "spec.npz", "wb") as f:
+        with pytest.raises(TypeError):
+            save_spec(f, node, 0)
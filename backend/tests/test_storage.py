@@ -0,0 +1,106 @@
+"""Tests of the artifact stores and the render lock."""
+
+import os
+import threading
+
+import pytest
+
+from cache import RenderCache
+from storage import ArtifactStore, LocalStore, SharedDirectoryStore, file_lock
+
+KEY = "ab" * 32
+
+
+def _cache(directory, max_bytes=1 << 20):
+    return RenderCache(str(directory), max_bytes, extension="txt")
+
+
+def _put(cache, key, content, tmp_path):
+    source = tmp_path / f"{key}-{content}.src"
+    source.write_text(content)
+    return cache.put(key, str(source))
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    """While one holder has the lock, another times out without it."""
+    path = str(tmp_path / "render.lock")
+    results = []
+
+    with file_lock(path) as acquired:
+        assert acquired
+
+        def contend():
+            with file_lock(path, timeout=0.2) as other:
+                results.append(other)
+
+        thread = threading.Thread(target=contend)
+        thread.start()
+        thread.join(5)
+        assert results == [False]
+        assert os.path.exists(path)
+
+    with file_lock(path, timeout=0.2) as acquired:
+        assert acquired
+
+
+def test_file_lock_waits_for_the_holder(tmp_path):
+    """A waiter acquires the lock once the holder releases it."""
+    path = str(tmp_path / "render.lock")
+    held = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def holder():
+        with file_lock(path):
+            held.set()
+            release.wait(5)
+            order.append("holder")
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    assert held.wait(5)
+    release.set()
+    with file_lock(path, timeout=5) as acquired:
+        order.append("waiter")
+        assert acquired
+    thread.join(5)
+    assert order == ["holder", "waiter"]
+
+
+def test_file_lock_removes_its_file(tmp_path):
+    """Lock files do not pile up once released."""
+    path = str(tmp_path / "render.lock")
+    with file_lock(path):
+        pass
+    assert not os.path.exists(path)
+
+
+def test_artifact_store_is_abstract():
+    """A store must implement fetch, publish and lock."""
+    with pytest.raises(TypeError):
+        ArtifactStore()  # pylint: disable=abstract-class-instantiated
+
+
+def test_shared_directory_store_shares_between_caches(tmp_path):
+    """An artifact published from one host's cache can be fetched into another's."""
+    store = SharedDirectoryStore(str(tmp_path / "shared"), 1 << 20)
+    first = _cache(tmp_path / "first")
+    second = _cache(tmp_path / "second")
+    _put(first, KEY, "video", tmp_path)
+
+    assert not store.fetch(second, KEY)
+    store.publish(first, KEY)
+    assert store.fetch(second, KEY)
+    with open(second.get(KEY)) as f:
+        assert f.read() == "video"
+
+
+def test_local_store_shares_nothing(tmp_path):
+    """LocalStore never has anything to fetch, but still locks."""
+    store = LocalStore(str(tmp_path / "locks"))
+    cache = _cache(tmp_path / "cache")
+    _put(cache, KEY, "video", tmp_path)
+    store.publish(cache, KEY)
+    assert not store.fetch(_cache(tmp_path / "other"), KEY)
+    with store.lock(cache, KEY) as acquired:
+        assert acquired
@@ -0,0 +1,93 @@
+"""Tests of the tracing front end and its sandbox."""
+
+import numpy as np
+import pytest
+
+import tracing
+from tracing import trace_numpy_code
+
+SNIPPET = """import numpy as np
+a = np.array([[1, 2], [3, 4]])
+b = a + 1
+for i in range(3):
+    c = np.sum(b)
+"""
+
+
+def test_records_each_distinct_call_once():
+    """The recorded steps are the snippet's NumPy calls, with their results, without repeats."""
+    nodes = trace_numpy_code(SNIPPET)
+    assert [node.operation for node in nodes] == ["add", "sum"]
+    add, total = nodes
+    assert np.array_equal(add.compute(), [[2, 3], [4, 5]])
+    assert np.array_equal(add.operands[0], [[1, 2], [3, 4]])
+    assert total.compute() == 14
+
+
+@pytest.mark.parametrize("code", [
+    "x = ().__class__.__bases__[0].__subclasses__()",
+    "x = [].__class__",
+    "x = __builtins__",
+    "x = np.array([1])._value",
+])
+def test_rejects_private_attributes_and_names(code):
+    """Dunder and private attributes, the usual sandbox escapes, are rejected before running."""
+    with pytest.raises(ValueError, match="not allowed"):
+        trace_numpy_code(code)
+
+
+def test_rejects_str_format():
+    """str.format can reach attributes through its fields, so it is rejected."""
+    with pytest.raises(ValueError, match="format"):
+        trace_numpy_code("x = '{0.__class__}'.format(1)")
+
+
+@pytest.mark.parametrize("code", ["import os", "import numpy, os", "from numpy import load"])
+def test_rejects_imports_other_than_numpy(code):
+    """Only `import numpy` is accepted."""
+    with pytest.raises(ValueError):
+        trace_numpy_code(code)
+
+
+@pytest.mark.parametrize("name", ["load", "save", "fromfile", "memmap", "DataSource"])
+def test_denied_numpy_attributes(name):
+    """NumPy's file access is not reachable through np."""
+    with pytest.raises(AttributeError, match=f"numpy.{name} is not available"):
+        trace_numpy_code(f"x = np.{name}")
+
+
+def test_private_numpy_attributes_are_rejected():
+    """np's private attributes are rejected like any other."""
+    with pytest.raises(ValueError, match="not allowed"):
+        trace_numpy_code("x = np._core")
+
+
+@pytest.mark.parametrize("code, error", [
+    ("x = np.random.rand(3)", ValueError),
+    ("x = np.linalg", AttributeError),
+])
+def test_numpy_submodules_are_not_available(code, error):
+    """Submodules fail with an error that says so."""
+    with pytest.raises(error, match="submodules"):
+        trace_numpy_code(code)
+
+
+def test_unknown_builtins_are_not_available():
+    """Only SAFE_BUILTINS are defined."""
+    with pytest.raises(NameError):
+        trace_numpy_code("x = getattr(1, 'real')")
+
+
+def test_range_is_bounded(monkeypatch):
+    """range() beyond TRACE_MAX_ITERATIONS fails instead of running."""
+    monkeypatch.setattr(tracing, "TRACE_MAX_ITERATIONS", 10)
+    trace_numpy_code("for i in range(10):\n    pass\n")
+    with pytest.raises(ValueError, match="range"):
+        trace_numpy_code("for i in range(11):\n    pass\n")
+
+
+def test_operations_are_bounded(monkeypatch):
+    """A snippet recording more than TRACE_MAX_OPERATIONS distinct calls fails."""
+    monkeypatch.setattr(tracing, "TRACE_MAX_OPERATIONS", 2)
+    with pytest.raises(ValueError, match="operations"):
+        trace_numpy_code("a = np.array([1, 2])\nfor i in range(3):\n    b = a + i\n")
@@ -0,0 +1,300 @@
+"""
+Execution-tracing front end: runs a snippet once against a tracing ndarray
+wrapper and records every NumPy call it makes.
+
+Unlike parse_numpy_code, which pattern-matches a few AST shapes, the snippet
+really runs, so loops, comprehensions and helper functions work, and each
+recorded step carries the concrete inputs and output of the call, so nothing
+has to be computed again afterwards. The snippet runs in a restricted
+namespace: a checked AST that only allows listed attributes, a small set of
+builtins and a NumPy proxy without file access or private attributes. The
+namespace limits what a snippet can reach, not how long it runs: run it under
+CPU and memory limits (see render.trace_snippet).
+"""
+
+import ast
+import os
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+from parse import OperationNode
+
+# Most NumPy calls one snippet may record, and most iterations of any range().
+TRACE_MAX_OPERATIONS = int(os.environ.get('TRACE_MAX_OPERATIONS', 200))
+TRACE_MAX_ITERATIONS = int(os.environ.get('TRACE_MAX_ITERATIONS', 10000))
+
+# ufunc names that differ from the operation names the templates know.
+UFUNC_ALIASES = {"absolute": "abs", "true_divide": "divide"}
+
+# NumPy attributes the snippet may not use: file and process access, and configuration.
+DENIED_NUMPY = {
+    "load", "save", "savez", "savez_compressed", "loadtxt", "savetxt", "genfromtxt",
+    "fromfile", "fromregex", "fromstring", "frombuffer", "memmap", "from_dlpack", "DataSource",
+    "show_config", "show_runtime", "info", "get_include", "set_printoptions",
+    "seterr", "seterrcall", "setbufsize", "add_newdoc",
+}
+
+# Array methods available to the snippet; each is recorded like the NumPy function.
+ARRAY_METHODS = {
+    "reshape", "ravel", "flatten", "squeeze", "transpose", "sum", "mean", "max", "min",
+    "median", "std", "var", "prod", "dot", "round", "clip", "cumsum", "argmax", "argmin",
+    "astype", "copy", "tolist", "item",
+}
+
+# Attributes a snippet may use on anything but `np`: array attributes and methods, and
+# methods of the builtin containers and strings (but not str.format and format_map,
+# whose field lookup reaches any attribute).
+ALLOWED_ATTRIBUTES = ARRAY_METHODS | {
+    "shape", "ndim", "size", "dtype", "T", "real", "imag",
+    "append", "extend", "insert", "pop", "remove", "index", "count", "sort", "reverse",
+    "keys", "values", "items", "get", "update", "join", "split", "strip", "upper", "lower",
+    "replace", "startswith", "endswith",
+}
+
+# Why np.random, np.linalg, np.fft and the other submodules fail: they would need
+# traced proxies of their own.
+SUBMODULE_MESSAGE = "NumPy submodules such as random, linalg and fft cannot be traced"
+
+# Statements and expressions a snippet may not contain.
+FORBIDDEN_NODES = (ast.ImportFrom, ast.While, ast.Global, ast.Nonlocal, ast.With,
+                   ast.AsyncFunctionDef, ast.AsyncFor, ast.AsyncWith, ast.Await,
+                   ast.Yield, ast.YieldFrom, ast.ClassDef)
+
+
+def bounded_range(*args: int) -> range:
+    """range() limited to TRACE_MAX_ITERATIONS iterations."""
+    values = range(*args)
+    if len(values) > TRACE_MAX_ITERATIONS:
+        raise ValueError(f"range() longer than {TRACE_MAX_ITERATIONS} iterations")
+    return values
+
+
+SAFE_BUILTINS: Dict[str, Any] = {
+    "range": bounded_range, "len": len, "list": list, "tuple": tuple, "dict": dict,
+    "set": set, "zip": zip, "enumerate": enumerate, "min": min, "max": max, "sum": sum,
+    "abs": abs, "round": round, "int": int, "float": float, "bool": bool, "str": str,
+    "sorted": sorted, "reversed": reversed, "map": map, "filter": filter, "any": any,
+    "all": all, "isinstance": isinstance, "print": lambda *args, **kwargs: None,
+}
+
+
+class TracedOperationNode(OperationNode):
+    """An operation node recorded while tracing, which already holds its result."""
+
+    def __init__(self, operation: str, operands: List[Any], kwargs: Dict[str, Any],
+                 result: Any) -> None:
+        """Initialize a node for a recorded call with its concrete inputs and output."""
+        super().__init__(operation, operands, **kwargs)
+        self.recorded = result
+
+    def compute(self) -> Any:
+        """Return the recorded result instead of running the operation again."""
+        self.result = self.recorded
+        return self.result
+
+
+class Tracer:
+    """Records the NumPy calls made on traced arrays, in execution order."""
+
+    def __init__(self) -> None:
+        """Initialize a tracer with no recorded calls."""
+        self.nodes: List[TracedOperationNode] = []
+        self._keys: Dict[str, TracedOperationNode] = {}
+
+    def wrap(self, value: Any) -> Any:
+        """Wrap arrays (also inside lists and tuples) so that their use is traced."""
+        if isinstance(value, TracedArray):
+            return value
+        elif isinstance(value, (np.ndarray, np.generic)):
+            return TracedArray(np.asarray(value), self)
+        elif isinstance(value, (list, tuple)):
+            return type(value)(self.wrap(item) for item in value)
+        return value
+
+    def unwrap(self, value: Any) -> Any:
+        """Replace traced arrays (also inside containers) by the arrays they hold."""
+        if isinstance(value, TracedArray):
+            return value._value
+        elif isinstance(value, (list, tuple)):
+            return type(value)(self.unwrap(item) for item in value)
+        elif isinstance(value, dict):
+            return {key: self.unwrap(item) for key, item in value.items()}
+        return value
+
+    def call(self, operation: str, function: Any, args: Tuple[Any, ...],
+             kwargs: Dict[str, Any]) -> Any:
+        """Run a NumPy function on unwrapped inputs and record it as an operation."""
+        args, kwargs = self.unwrap(tuple(args)), self.unwrap(kwargs)
+        result = function(*args, **kwargs)
+        if operation in OperationNode.operations:
+            self.record(operation, list(args), kwargs, result)
+        return self.wrap(result)
+
+    def record(self, operation: str, args: List[Any], kwargs: Dict[str, Any],
+               result: Any) -> None:
+        """Add a node for a call, unless the same call was already recorded."""
+        # Operands are shown as matrices, and results rounded, as in OperationNode.compute
+        operands = [np.atleast_2d(arg) if isinstance(arg, np.ndarray) else arg for arg in args]
+        try:
+            shown = np.around(result, 2)
+        except (TypeError, ValueError):
+            shown = result
+        node = TracedOperationNode(operation, operands, kwargs, shown)
+        if node.key in self._keys:
+            return
+        if len(self.nodes) >= TRACE_MAX_OPERATIONS:
+            raise ValueError(f"More than {TRACE_MAX_OPERATIONS} operations traced")
+        self._keys[node.key] = node
+        self.nodes.append(node)
+
+
+class TracedArray(NDArrayOperatorsMixin):
+    """
+    An ndarray wrapper that reports every NumPy function, ufunc and operator
+    applied to it to its tracer.
+    """
+
+    def __init__(self, value: np.ndarray, tracer: Tracer) -> None:
+        """Wrap an array for the given tracer; snippets cannot reach either directly."""
+        self._value = value
+        self._tracer = tracer
+
+    def __array__(self, dtype: Any = None, copy: Optional[bool] = None) -> np.ndarray:
+        return np.asarray(self._value, dtype=dtype)
+
+    def __array_ufunc__(self, ufunc: np.ufunc, method: str, *inputs: Any, **kwargs: Any) -> Any:
+        name = UFUNC_ALIASES.get(ufunc.__name__, ufunc.__name__)
+        if method != "__call__":
+            return self._tracer.call(f"{name}.{method}", getattr(ufunc, method), inputs, kwargs)
+        return self._tracer.call(name, ufunc, inputs, kwargs)
+
+    def __array_function__(self, func: Any, types: Any, args: Tuple[Any, ...],
+                           kwargs: Dict[str, Any]) -> Any:
+        return self._tracer.call(func.__name__, func, args, kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in ("shape", "ndim", "size", "dtype"):
+            return getattr(self._value, name)
+        elif name == "T":
+            return self._tracer.call("transpose", np.transpose, (self,), {})
+        elif name == "flatten":
+            return lambda: self._tracer.call("flatten", np.ravel, (self,), {})
+        elif name in ("reshape",):
+            return lambda *shape, **kwargs: np.reshape(
+                self, shape[0] if len(shape) == 1 else shape, **kwargs)
+        elif name in ("astype", "copy", "tolist", "item"):
+            return lambda *args, **kwargs: self._tracer.wrap(
+                getattr(self._value, name)(*self._tracer.unwrap(args), **kwargs))
+        elif name in ARRAY_METHODS:
+            function = getattr(np, name)
+            return lambda *args, **kwargs: function(self, *args, **kwargs)
+        raise AttributeError(f"Array attribute '{name}' is not available")
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._tracer.wrap(self._value[self._tracer.unwrap(index)])
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        self._value[self._tracer.unwrap(index)] = self._tracer.unwrap(value)
+
+    def __len__(self) -> int:
+        return len(self._value)
+
+    def __iter__(self):
+        return (self._tracer.wrap(item) for item in self._value)
+
+    def __bool__(self) -> bool:
+        return bool(self._value)
+
+    def __int__(self) -> int:
+        return int(self._value)
+
+    def __float__(self) -> float:
+        return float(self._value)
+
+    def __index__(self) -> int:
+        return self._value.__index__()
+
+    def __repr__(self) -> str:
+        return repr(self._value)
+
+    def __str__(self) -> str:
+        return str(self._value)
+
+
+class TracedNumpy:
+    """
+    The `np` seen by a traced snippet: NumPy's public API, returning traced arrays.
+    Submodules (np.random, np.linalg, np.fft, ...) are not available.
+    """
+
+    def __init__(self, tracer: Tracer) -> None:
+        """Initialize the proxy for the given tracer."""
+        self._tracer = tracer
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or name in DENIED_NUMPY:
+            raise AttributeError(f"numpy.{name} is not available")
+        attribute = getattr(np, name)
+        if isinstance(attribute, type(np)):
+            raise AttributeError(f"numpy.{name} is not available: {SUBMODULE_MESSAGE}")
+        if callable(attribute) and not isinstance(attribute, type):
+            # Creation functions get no traced input, so their results are wrapped here
+            tracer = self._tracer
+            return lambda *args, **kwargs: tracer.wrap(attribute(*args, **kwargs))
+        return attribute
+
+
+def _is_numpy(node: ast.AST, submodule: bool = False) -> bool:
+    """Whether the expression is `np` (or `numpy`), or with submodule, an attribute of it."""
+    if submodule:
+        return isinstance(node, ast.Attribute) and _is_numpy(node.value)
+    return isinstance(node, ast.Name) and node.id in ("np", "numpy")
+
+
+def check_code(tree: ast.Module) -> ast.Module:
+    """
+    Reject snippets that use anything beyond plain computation, and drop
+    `import numpy` statements, as `np` is provided.
+    Attributes of `np` are checked by TracedNumpy; any other attribute must be
+    in ALLOWED_ATTRIBUTES, which keeps snippets away from the internals of the
+    objects they get hold of.
+    Raises ValueError for forbidden constructs.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, FORBIDDEN_NODES):
+            raise ValueError(f"{type(node).__name__} is not allowed")
+        elif isinstance(node, ast.Import):
+            if any(alias.name != "numpy" for alias in node.names):
+                raise ValueError("Only numpy can be imported")
+        elif isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            raise ValueError(f"Attribute '{node.attr}' is not allowed")
+        elif isinstance(node, ast.Attribute) and node.attr in ("format", "format_map"):
+            raise ValueError("String formatting with format() is not allowed, use f-strings")
+        elif (isinstance(node, ast.Attribute) and node.attr not in ALLOWED_ATTRIBUTES
+              and _is_numpy(node.value, submodule=True)):
+            raise ValueError(f"numpy.{node.value.attr}.{node.attr} is not available: "
+                             f"{SUBMODULE_MESSAGE}")
+        elif (isinstance(node, ast.Attribute) and node.attr not in ALLOWED_ATTRIBUTES
+              and not _is_numpy(node.value)):
+            raise ValueError(f"Attribute '{node.attr}' is not allowed")
+        elif isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise ValueError(f"Name '{node.id}' is not allowed")
+    tree.body = [statement for statement in tree.body if not isinstance(statement, ast.Import)]
+    return tree
+
+
+def trace_numpy_code(code: str) -> List[OperationNode]:
+    """
+    Run a snippet of NumPy code with traced arrays and return the operations it
+    performed, in execution order, each with its result already recorded.
+    Identical calls on identical inputs are recorded once.
+    """
+    tree = check_code(ast.parse(code))
+    tracer = Tracer()
+    numpy = TracedNumpy(tracer)
+    namespace = {"__builtins__": SAFE_BUILTINS, "np": numpy, "numpy": numpy}
+    exec(compile(tree, "<snippet>", "exec"), namespace)  # pylint: disable=exec-used
+    return tracer.nodes
@@ -0,0 +1,78 @@
+"""Process pools whose workers are replaced after a number of tasks."""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    A ProcessPoolExecutor that is replaced by a fresh one after it ran
+    max_tasks tasks per worker on average, or when recycle() is called (e.g. once
+    its workers grew too large or one died). Tasks already submitted to a
+    replaced executor still finish.
+
+    This bounds the tasks a worker serves like max_tasks_per_child, which needs
+    Python 3.11, does.
+    """
+
+    def __init__(self, name: str, workers: int, initializer: Optional[Callable[[], None]],
+                 max_tasks: int, prepare: Optional[Callable[[], None]] = None) -> None:
+        """
+        Initialize the pool without starting it; prepare, if given, runs in this
+        process before each executor is created.
+        """
+        self.name = name
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.max_tasks = max_tasks
+        self.prepare = prepare
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._submitted = 0
+        self._lock = threading.Lock()
+
+    def _current(self) -> ProcessPoolExecutor:
+        """Return the current executor, creating and warming it if needed; holds _lock."""
+        if self._executor is None:
+            if self.prepare is not None:
+                self.prepare()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=self.initializer)
+            self._submitted = 0
+            # Start every worker now, so that they initialize before the first real task
+            for _ in range(self.workers):
+                self._executor.submit(os.getpid)
+        return self._executor
+
+    def start(self) -> None:
+        """Start the workers ahead of the first task."""
+        with self._lock:
+            self._current()
+
+    def submit(self, function: Callable, *args: Any) -> Tuple[ProcessPoolExecutor, Future]:
+        """
+        Submit a task; returns the executor that runs it, to be passed to
+        recycle() if the task shows that its workers need replacing.
+        """
+        with self._lock:
+            executor = self._current()
+            future = executor.submit(function, *args)
+            self._submitted += 1
+            replace = self.max_tasks > 0 and self._submitted >= self.max_tasks * self.workers
+        if replace:
+            self.recycle(executor)
+        return executor, future
+
+    def recycle(self, executor: ProcessPoolExecutor) -> None:
+        """Replace the given executor, unless it was already replaced, and start its successor."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            logger.info("Recycling %s worker pool", self.name)
+            self._executor = None
+            executor.shutdown(wait=False)
+            self._current()
@@ -19,6 +19,7 @@ export default function Home() {
   const [loading, setLoading] = useState<boolean>(false);
   const [errorLine, setErrorLine] = useState<number | null>(null);
   const [videoKey, setVideoKey] = useState<number>(Date.now());
+  const [sessionId] = useState<string>(() => `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
 
   const handleVisualize = async (code: string) => {
     setLoading(true);
@@ -26,7 +27,7 @@ export default function Home() {
     setErrorLine(null);
 
     try {
-      const response = await axios.post<VisualizationResult[]>('/api/visualize', { code });
+      const response = await axios.post<VisualizationResult[]>('/api/visualize', { code, session_id: sessionId });
       setResults(response.data);
       setVideoKey(Date.now());
     } catch (err) {
@@ -84,7 +85,7 @@ export default function Home() {
                   setError("Failed to load video");
                 }}
               >
-                <source src={`${API_URL}/video/${index}`} type="video/mp4" />
+                <source src={`${API_URL}${result.video_url}`} type="video/mp4" />
                 Your browser does not support the video tag.
               </video>
             </div>